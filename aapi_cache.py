@@ -0,0 +1,67 @@
+# figure cache shared by every gunicorn worker on the host, in a sqlite file (AAPI_CACHE_PATH, off when unset).
+# it sits behind each worker's in-process cache: a figure one worker renders is read by the others instead of re-rendered.
+# keys carry the data version (aapi_data.current_version), so figures of data a worker no longer holds are never served to it,
+# and old versions simply stop being read until they expire. entries live AAPI_CACHE_TTL seconds (default a day) and the
+# oldest go first once the file holds more than AAPI_CACHE_MAX_MB of figures (default 256)
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+
+
+log = logging.getLogger(__name__)
+
+path = os.environ.get('AAPI_CACHE_PATH')
+enabled = bool(path)
+ttl = float(os.environ.get('AAPI_CACHE_TTL', 24 * 3600))
+max_bytes = int(float(os.environ.get('AAPI_CACHE_MAX_MB', 256)) * 1024 * 1024)
+prune_every = 100
+
+local = threading.local()
+puts = 0
+
+def connection():
+    # one connection per thread, reopened in a forked worker rather than shared with the process that opened it
+    if getattr(local, 'pid', None) != os.getpid():
+        conn = sqlite3.connect(path, timeout = 5, isolation_level = None)
+        conn.execute('pragma journal_mode = wal')
+        conn.execute('pragma synchronous = normal')
+        conn.execute('create table if not exists figures (key text primary key, value text, expires real, size integer)')
+        conn.execute('create index if not exists ix_figures_expires on figures (expires)')
+        local.conn, local.pid = conn, os.getpid()
+    return local.conn
+
+def cache_key(version, key):
+    return json.dumps([version] + list(key))
+
+def get(version, key):
+    try:
+        row = connection().execute('select value from figures where key = ? and expires > ?', (cache_key(version, key), time.time())).fetchone()
+    except sqlite3.Error:
+        log.exception('shared figure cache read failed')
+        return None
+    return row[0] if row else None
+
+def put(version, key, value):
+    global puts
+    try:
+        connection().execute('insert or replace into figures values (?, ?, ?, ?)', (cache_key(version, key), value, time.time() + ttl, len(value)))
+        puts += 1
+        if puts % prune_every == 0:
+            prune()
+    except sqlite3.Error:
+        log.exception('shared figure cache write failed')
+
+def prune():
+    conn = connection()
+    conn.execute('delete from figures where expires <= ?', (time.time(),))
+    excess = conn.execute('select coalesce(sum(size), 0) from figures').fetchone()[0] - max_bytes
+    if excess > 0:
+        # every entry gets the same ttl, so the earliest to expire were written first
+        conn.execute('''delete from figures where key in (select key from
+            (select key, size, sum(size) over (order by expires, key) as written from figures) where written - size < ?)''', (excess,))
+
+def clear():
+    connection().execute('delete from figures')
@@ -1,276 +1,369 @@
-import pandas as pd
-import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+import plotly.utils
 import os
-from sqlalchemy import create_engine
-from dash import Dash, html, dcc, callback, Output, Input
-
-
-engine = create_engine('sqlite:///aapi_dash.db', echo = False)
-
-
-# if needed, place an 'r' before any parameter in order to address special characters such as '\'. For example, if your user name contains '\', you'll need to place 'r' before the user name: user=r'User Name'
-
-asian_groups_ug = '''
-select trim(asian_group) asian_group,
-year_term,
-trim(semester) semester,
-total
-from asian_group_counts
-'''
-
-pacific_islander_groups_ug = '''
-select trim(pacific_islander_group) pacific_islander_group,
-year_term,
-trim(semester) semester,
-total
-from pacific_islander_group_counts 
-'''
-
-FTF_ASIAN = '''
-select trim(asian_group) asian_group,
-cohort_year_term,
-cohort_semester,
-"#ENTERING_COHORT",
-retention_1yr,
-retention_2yr,
-retention_4yr,
-retention_6yr
-from ftf_asian_rtn
-'''
-
-FTF_PACIFIC_ISLANDER =  '''
-select trim(pacific_islander_group) pacific_islander_group,
-cohort_year_term,
-cohort_semester,
-"#ENTERING_COHORT",
-retention_1yr,
-retention_2yr,
-retention_4yr,
-retention_6yr
-from ftf_pi_rtn
-'''
-
-TRANSFER_ASIAN =  '''
-select trim(asian_group) asian_group,
-cohort_year_term,
-cohort_semester,
-"#ENTERING_COHORT",
-retention_1yr,
-retention_2yr,
-retention_4yr,
-retention_6yr from trf_asian_rtn
-'''
-
-TRANSFER_PACIFIC_ISLANDER = '''
-select trim(pacific_islander_group) pacific_islander_group,
-cohort_year_term,
-cohort_semester,
-"#ENTERING_COHORT",
-retention_1yr,
-retention_2yr,
-retention_4yr,
-retention_6yr from tfr_pi_rtn
-'''
-
-asian_standing = '''
-select trim(asian_group) asian_group,
-standing, 
-year_term,
-semester,
-total_enroll,
-standing_count,
-standing_pct
-from asian_standing where total_enroll >= 5
-order by 3, 6 desc, 5 desc, 1 
-'''
-
-pi_standing = '''
-select trim(pacific_islander_group) pacific_islander_group,
-standing, 
-year_term,
-semester,
-total_enroll,
-standing_count,
-standing_pct
-from pi_standing where total_enroll >= 5
-order by 3, 6 desc, 5 desc, 1 
-'''
-
-#enrollment counts
-asian_group_counts_ug_frame = pd.read_sql_query(asian_groups_ug, engine)
-asian_group_counts_columns = asian_group_counts_ug_frame.transpose().values.tolist()
-
-pacific_islander_group_counts_ug_frame = pd.read_sql_query(pacific_islander_groups_ug, engine)
-pacific_islander_group_counts_columns = pacific_islander_group_counts_ug_frame.transpose().values.tolist()
-
-#retention
-ftf_asian_frame = pd.read_sql_query(FTF_ASIAN, engine)
-ftf_pacific_islander_frame = pd.read_sql_query(FTF_PACIFIC_ISLANDER, engine)
-transfer_asian_frame = pd.read_sql_query(TRANSFER_ASIAN, engine)
-transfer_pacific_islander_frame = pd.read_sql_query(TRANSFER_PACIFIC_ISLANDER, engine)
-
-ftf_asian_frame.drop(ftf_asian_frame.columns[1], axis = 1, inplace = True)
-ftf_pacific_islander_frame.drop(ftf_pacific_islander_frame.columns[1], axis = 1, inplace = True)
-transfer_asian_frame.drop(transfer_asian_frame.columns[1], axis = 1, inplace = True)
-transfer_pacific_islander_frame.drop(transfer_pacific_islander_frame.columns[1], axis = 1, inplace = True)
-
-ftf_asian_frame.fillna("", inplace = True)
-ftf_pacific_islander_frame.fillna("", inplace = True)
-transfer_asian_frame.fillna("", inplace = True)
-transfer_pacific_islander_frame.fillna("", inplace = True)
-
-ftf_asian_frame.columns = ['Asian Group', 'Cohort Semester', '#Entering Cohort', 'Retention 1Yr', 'Retention 2Yr', 'Retention 4Yr', 'Retention 6Yr']
-transfer_asian_frame.columns = ['Asian Group', 'Cohort Semester', '#Entering Cohort', 'Retention 1Yr', 'Retention 2Yr', 'Retention 4Yr', 'Retention 6Yr']
-ftf_pacific_islander_frame.columns = ['Pacific Islander Group', 'Cohort Semester', '#Entering Cohort', 'Retention 1Yr', 'Retention 2Yr', 'Retention 4Yr', 'Retention 6Yr']
-transfer_pacific_islander_frame.columns = ['Pacific Islander Group', 'Cohort Semester', '#Entering Cohort', 'Retention 1Yr', 'Retention 2Yr', 'Retention 4Yr', 'Retention 6Yr']
-
-ftf_asian_frame_columns = ftf_asian_frame.transpose().values.tolist()
-transfer_asian_frame_columns = transfer_asian_frame.transpose().values.tolist()
-ftf_pacific_islander_frame_columns = ftf_pacific_islander_frame.transpose().values.tolist()
-transfer_pacific_islander_frame_columns = transfer_pacific_islander_frame.transpose().values.tolist()
-
-#standing
-asian_standing_frame = pd.read_sql_query(asian_standing, engine)
-
-asian_standing_frame.columns = ['Asian Group', 'Academic Standing', 'Term Code', 'Semester', 'Total Enrollment', 'Standing Total', 'Standing %']
-
-asian_standing_columns =  asian_standing_frame.transpose().values.tolist()
-
-
-pi_standing_frame = pd.read_sql_query(pi_standing, engine)
-
-pi_standing_frame.columns = ['Pacific Islander Group', 'Academic Standing', 'Term Code', 'Semester', 'Total Enrollment', 'Standing Total', 'Standing %']
-
-pi_standing_columns =  pi_standing_frame.transpose().values.tolist()
-
-
-app = Dash(__name__)
-
-app.layout = html.Div([
-    html.Div(children = 'Student Enrollment by Ethnic Sub-groups: Asian Groups'),
-    dcc.Dropdown(options= asian_group_counts_ug_frame['asian_group'].unique(), value = 'Filipino',  id = 'controls-and-drop', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph'), 
+import json
+import functools
+import threading
+from collections import OrderedDict
+import aapi_data
+import aapi_metrics
+import aapi_cache
+import aapi_export
+from dash import Dash, html, dcc, callback, clientside_callback, ctx, no_update, ClientsideFunction, Output, Input, State, ALL
+
+
+#lean figures
+# plotly's default template is ~7.5kB of defaults, mostly for trace types and layouts this dashboard never draws, and it rides
+# along in every figure response. the lean template keeps only what the line, pie and table figures use (~1kB), and is
+# sent once with the page instead: figures are rendered with it (px takes trace colors from it) and then stripped of it,
+# and assets/aapi_figures.js puts figure_template back into every figure that arrives without one.
+# AAPI_LEAN_FIGURES=0 goes back to the full template in every figure
+figure_template = None
+if os.environ.get('AAPI_LEAN_FIGURES', '1') == '1':
+    plotly_template = pio.templates['plotly']
+    pio.templates['aapi_lean'] = go.layout.Template(
+        layout = {key: plotly_template.layout[key] for key in ['autotypenumbers', 'colorway', 'font', 'hovermode', 'hoverlabel', 'paper_bgcolor', 'plot_bgcolor', 'xaxis', 'yaxis', 'title']},
+        data = {'pie': plotly_template.data.pie, 'table': plotly_template.data.table})
+    pio.templates.default = 'aapi_lean'
+    figure_template = json.loads(json.dumps(pio.templates['aapi_lean'].to_plotly_json(), cls = plotly.utils.PlotlyJSONEncoder))
+
+def strip_template(fig):
+    if figure_template is not None:
+        fig.layout.template = None
+    return fig
+
+
+#figure cache
+# rendered figures are kept as plain json dicts keyed by (chart, group/semester, metric), so a repeat
+# request skips px/go construction entirely. set AAPI_PRERENDER=1 to render every dropdown value at boot.
+# with AAPI_CACHE_PATH set, a miss here is looked up in the cache shared by all workers (aapi_cache) before rendering.
+# chart_sources maps each chart to the (dataset, column) its dropdown selects on, so an ingest only drops the figures it changed
+figure_cache_size = int(os.environ.get('AAPI_FIGURE_CACHE_SIZE', 1024))
+figure_cache = OrderedDict()
+figure_cache_lock = threading.Lock()
+figure_renderers = []
+chart_sources = {}
+
+def invalidate_figure_cache():
+    with figure_cache_lock:
+        figure_cache.clear()
+
+def invalidate_ingested(changes):
+    # changes is {dataset: {column: group keys that gained rows}}, or {dataset: None} when a dataset was re-read in full.
+    # comparison charts are keyed by a tuple of groups and go if any of them changed
+    with figure_cache_lock:
+        for key in list(figure_cache):
+            dataset, column = chart_sources[key[0]]
+            selects = key[1] if isinstance(key[1], tuple) else (key[1],)
+            if dataset in changes and (changes[dataset] is None or any(select in changes[dataset].get(column, []) for select in selects)):
+                del figure_cache[key]
+
+def render_cached(key, render):
+    chart = key[0]
+    with figure_cache_lock:
+        if key in figure_cache:
+            figure_cache.move_to_end(key)
+            aapi_metrics.increment('aapi_figure_cache_total', name = chart, result = 'hit')
+            return figure_cache[key]
+    generation, version = aapi_data.generation, aapi_data.current_version()
+    shared = aapi_cache.get(version, key) if aapi_cache.enabled else None
+    if shared is not None:
+        aapi_metrics.increment('aapi_figure_cache_total', name = chart, result = 'shared_hit')
+        with aapi_metrics.timed('serialize', chart):
+            fig = json.loads(shared)
+    else:
+        aapi_metrics.increment('aapi_figure_cache_total', name = chart, result = 'miss')
+        with aapi_metrics.timed('figure', chart):
+            fig = strip_template(render())
+        with aapi_metrics.timed('serialize', chart):
+            shared = fig.to_json()
+            fig = json.loads(shared)
+        if aapi_cache.enabled and generation == aapi_data.generation:
+            aapi_cache.put(version, key, shared)
+    with figure_cache_lock:
+        # a figure rendered from frames that were swapped out mid-render is served but not kept
+        if generation == aapi_data.generation:
+            figure_cache[key] = fig
+        while len(figure_cache) > figure_cache_size:
+            figure_cache.popitem(last = False)
+    return fig
+
+aapi_data.reload_listeners.append(invalidate_figure_cache)
+aapi_data.ingest_listeners.append(invalidate_ingested)
+aapi_metrics.gauge('aapi_figure_cache_entries', lambda: len(figure_cache))
+aapi_metrics.gauge('aapi_data_generation', lambda: aapi_data.generation)
+
+def cached_figure(chart, metric, options):
+    def decorator(render):
+        @functools.wraps(render)
+        def wrapper(select):
+            return render_cached((chart, select, metric), lambda: render(select))
+        figure_renderers.append((wrapper, options))
+        chart_sources[chart] = options
+        return wrapper
+    return decorator
+
+def prerender_figures():
+    # every dropdown value of every single-select chart, and each comparison chart's default groups under every metric
+    count = 0
+    for render, (dataset, column) in figure_renderers:
+        for select in aapi_data.group_values(dataset, column):
+            render(select)
+            count += 1
+    for chart, comparison in comparison_charts.items():
+        for metric in comparison['metrics']:
+            comparison_figure(chart, comparison['groups'], metric)
+            count += 1
+    return count
+
+
+#retention charts
+# every cohort table gets a 1/2/4/6-year line chart. to add a cohort table, add its dataset in aapi_data and an entry here
+retention_cohorts = {
+    'ftf_asian': dict(label = 'FTF', groups = 'Asian Groups', dataset = 'ftf_asian', group_column = 'Asian Group', default = 'Filipino'),
+    'ftf_pi': dict(label = 'FTF', groups = 'Pacific Islander Groups', dataset = 'ftf_pacific_islander', group_column = 'Pacific Islander Group', default = 'Other Pac.Islander'),
+    'trf_asian': dict(label = 'Transfer', groups = 'Asian Groups', dataset = 'transfer_asian', group_column = 'Asian Group', default = 'Filipino'),
+    'trf_pi': dict(label = 'Transfer', groups = 'Pacific Islander Groups', dataset = 'transfer_pacific_islander', group_column = 'Pacific Islander Group', default = 'Other Pac.Islander'),
+    }
+retention_years = [1, 2, 4, 6]
+retention_charts = {'%s_%d' % (cohort, years): (cohort, years) for cohort in retention_cohorts for years in retention_years}
+
+def retention_figure(chart, select):
+    cohort, years = retention_charts[chart]
+    table, metric = retention_cohorts[cohort], 'Retention %dYr' % years
+    return render_cached((cohort + '_line', select, metric), lambda: px.line(aapi_data.lookup(table['dataset'], table['group_column'], select), x = 'Cohort Semester', y = metric, color = table['group_column'], height = 600, width = 1200))
+
+def retention_layout(cohorts):
+    children = []
+    for chart, (cohort, years) in retention_charts.items():
+        if cohort not in cohorts:
+            continue
+        table = retention_cohorts[cohort]
+        children += [
+            html.Div(children = '%s %d-Year Student Retention by Ethnic Sub-groups: %s' % (table['label'], years, table['groups'])),
+            dcc.Dropdown(options= aapi_data.group_values(table['dataset'], table['group_column']), value = table['default'], id = {'type': 'rtn-drop', 'index': chart}, placeholder = 'Select group from list below' ),
+            dcc.Loading(dcc.Graph(figure = {}, id = {'type': 'rtn-graph', 'index': chart})),
+            ]
+    return children
+
+for chart, (cohort, years) in retention_charts.items():
+    table = retention_cohorts[cohort]
+    figure_renderers.append((functools.partial(retention_figure, chart), (table['dataset'], table['group_column'])))
+    chart_sources[cohort + '_line'] = (table['dataset'], table['group_column'])
+
+
+#table charts
+# the retention and standing tables are built in the browser. each dataset ships once with the page in a dcc.Store and
+# assets/aapi_tables.js filters it and fills in the go.Table, so switching groups in a table never reaches the server.
+# stores are column-major, with categorical columns sent as integer codes plus their labels
+table_charts = {
+    'controls-and-graph_rtn_asian_ftf_chart': dict(drop = 'controls-and-drop_rtn_asian_ftf_chart', dataset = 'ftf_asian', group_column = 'Asian Group'),
+    'controls-and-graph_rtn_pi_ftf_chart': dict(drop = 'controls-and-drop_rtn_pi_ftf_chart', dataset = 'ftf_pacific_islander', group_column = 'Pacific Islander Group'),
+    'controls-and-graph_rtn_asian_trf_chart': dict(drop = 'controls-and-drop_rtn_asian_trf_chart', dataset = 'transfer_asian', group_column = 'Asian Group'),
+    'controls-and-graph_rtn_pi_trf_chart': dict(drop = 'controls-and-drop_rtn_pi_trf_chart', dataset = 'transfer_pacific_islander', group_column = 'Pacific Islander Group'),
+    'controls-and-graph_stndg_asian_chart': dict(drop = 'controls-and-drop_stndg_asian_chart', dataset = 'asian_standing', group_column = 'Asian Group'),
+    'controls-and-graph_stndg_pi_chart': dict(drop = 'controls-and-drop_stndg_pi_chart', dataset = 'pi_standing', group_column = 'Pacific Islander Group'),
+    }
+table_store_cache = {}
+
+def table_data(name, group_column):
+    frame = aapi_data.frame(name)
+    values, labels = [], []
+    for column in frame.columns:
+        if frame[column].dtype.name == 'category':
+            values.append(frame[column].cat.codes.tolist())
+            labels.append(frame[column].cat.categories.tolist())
+        else:
+            values.append(frame[column].astype(object).where(frame[column].notna(), None).tolist())
+            labels.append(None)
+    return {'columns': list(frame.columns), 'group': list(frame.columns).index(group_column), 'values': values, 'labels': labels}
+
+def table_shell():
+    # an empty table rendered through the active template, which the browser copies and fills for every group
+    return json.loads(strip_template(go.Figure(data = [go.Table(header = dict(fill_color = 'lavender', align = 'left'))])).to_json())
+
+def table_store(store_id, build):
+    # encoded once per data generation and reused for every page load. entries are (generation, data) with the generation read
+    # first, so a store encoded from the old frames while a swap clears the cache is rebuilt on next use instead of kept
+    current = aapi_data.generation
+    cached = table_store_cache.get(store_id)
+    if cached is None or cached[0] != current:
+        cached = table_store_cache[store_id] = (current, build())
+    return dcc.Store(id = store_id, data = cached[1])
+
+def table_stores(names):
+    group_columns = {table['dataset']: table['group_column'] for table in table_charts.values()}
+    return [table_store('table-shell', table_shell)] + [table_store('table-data-' + name, functools.partial(table_data, name, group_columns[name])) for name in names]
+
+aapi_data.reload_listeners.append(table_store_cache.clear)
+aapi_data.ingest_listeners.append(lambda changes: table_store_cache.clear())
+
+
+#comparison charts
+# several groups on one chart, drawn from the summaries in aapi_data rather than filtered out of the raw frames one group at a time.
+# trend summaries have one column per metric; retention summaries have one row per horizon, so their metric picks the horizon
+trend_metrics = ['Enrollment', 'Share %', 'YoY Change', 'YoY Change %']
+horizons = ['%dYr' % years for years in retention_years]
+comparison_charts = {
+    'asian_trends': dict(title = 'Enrollment Comparison: Asian Groups', summary = 'asian_trends', x = 'semester', metrics = trend_metrics, groups = ['Filipino', 'Chinese', 'Vietnamese']),
+    'pi_trends': dict(title = 'Enrollment Comparison: Pacific Islander Groups', summary = 'pacific_islander_trends', x = 'semester', metrics = trend_metrics, groups = ['Other Pac.Islander', 'Native Hawaiian', 'Samoan']),
+    'ftf_asian_horizons': dict(title = 'FTF Student Retention Comparison: Asian Groups', summary = 'ftf_asian_horizons', x = 'Cohort Semester', y = 'Retention', metrics = horizons, groups = ['Filipino', 'Chinese', 'Vietnamese']),
+    'ftf_pi_horizons': dict(title = 'FTF Student Retention Comparison: Pacific Islander Groups', summary = 'ftf_pacific_islander_horizons', x = 'Cohort Semester', y = 'Retention', metrics = horizons, groups = ['Other Pac.Islander', 'Native Hawaiian', 'Samoan']),
+    'trf_asian_horizons': dict(title = 'Transfer Student Retention Comparison: Asian Groups', summary = 'transfer_asian_horizons', x = 'Cohort Semester', y = 'Retention', metrics = horizons, groups = ['Filipino', 'Chinese', 'Vietnamese']),
+    'trf_pi_horizons': dict(title = 'Transfer Student Retention Comparison: Pacific Islander Groups', summary = 'transfer_pacific_islander_horizons', x = 'Cohort Semester', y = 'Retention', metrics = horizons, groups = ['Other Pac.Islander', 'Native Hawaiian', 'Samoan']),
+    }
+
+def comparison_figure(chart, groups, metric):
+    comparison = comparison_charts[chart]
+    summary = aapi_data.summaries[comparison['summary']]
+    groups = tuple(sorted(groups or []))
+    def render():
+        rows = aapi_data.summary_lookup(comparison['summary'], groups)
+        if 'y' in comparison:
+            return px.line(rows[rows['Horizon'] == metric], x = comparison['x'], y = comparison['y'], color = summary['group'], height = 600, width = 1200)
+        return px.line(rows, x = comparison['x'], y = metric, color = summary['group'], height = 600, width = 1200)
+    return render_cached((chart, groups, metric), render)
+
+def comparison_layout(charts):
+    children = []
+    for chart in charts:
+        comparison = comparison_charts[chart]
+        summary = aapi_data.summaries[comparison['summary']]
+        children += [
+            html.Div(children = comparison['title']),
+            dcc.Dropdown(options= aapi_data.group_values(summary['source'], summary['group']), value = comparison['groups'], multi = True, id = {'type': 'cmp-groups', 'index': chart}, placeholder = 'Select groups from list below' ),
+            dcc.Dropdown(options= comparison['metrics'], value = comparison['metrics'][0], clearable = False, id = {'type': 'cmp-metric', 'index': chart}),
+            dcc.Loading(dcc.Graph(figure = {}, id = {'type': 'cmp-graph', 'index': chart})),
+            ]
+    return children
+
+for chart, comparison in comparison_charts.items():
+    summary = aapi_data.summaries[comparison['summary']]
+    chart_sources[chart] = (summary['source'], summary['group'])
+
+
+# the layout is built per page load, so dropdown options come from the current frames and importing this module runs no queries.
+# suppress_callback_exceptions stops dash from calling serve_layout at import to validate callback ids
+# compress gzips every response through flask-compress.
+# AAPI_COMPRESS=0 turns it off for deployments where a reverse proxy already compresses
+app = Dash(__name__, suppress_callback_exceptions = True, compress = os.environ.get('AAPI_COMPRESS', '1') == '1')
+aapi_metrics.register(app.server)
+aapi_export.register(app.server)
+
+# the lean template goes out once, inlined in the index page, for assets/aapi_figures.js
+if figure_template is not None:
+    app.index_string = app.index_string.replace('{%app_entry%}', '{%app_entry%}\n        <script id="aapi-figure-template" type="application/json">' +
+        json.dumps(figure_template, separators = (',', ':')).replace('</', '<\\/') + '</script>')
+
+#sections
+# the dashboard is split into tabs. only the open tab's components are in the page, so only its callbacks fire and only its
+# figures and table stores are built; opening another tab fetches that section's layout and then its figures.
+# each graph has its own loading spinner until its figure arrives
+def enrollment_section():
+    return [
+        html.Div(children = 'Student Enrollment by Ethnic Sub-groups: Asian Groups'),
+        dcc.Dropdown(options= aapi_data.group_values('asian_group_counts', 'asian_group'), value = 'Filipino',  id = 'controls-and-drop', placeholder = 'Select group from list below' ),
+        dcc.Loading(dcc.Graph(figure = {}, id = 'controls-and-graph')), 
     
-    html.Div(children = 'Student Enrollment by Ethnic Sub-groups: Pacific Islander Groups'),
-    dcc.Dropdown(options= pacific_islander_group_counts_ug_frame['pacific_islander_group'].unique(), value = 'Other Pac.Islander',  id = 'controls-and-drop_pi', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_pi'),
-
-    html.Div(children = 'Student Enrollment by Ethnic Sub-groups: Asian Groups'),
-    dcc.Dropdown(options= asian_group_counts_ug_frame.semester.unique(), value = 'Fall   2019',  id = 'controls-and-drop_pie', placeholder = 'Select semester from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_pie'),
-
-    html.Div(children = 'Student Enrollment by Ethnic Sub-groups: Pacific Islander Groups'),
-    dcc.Dropdown(options= pacific_islander_group_counts_ug_frame.semester.unique(), value = 'Fall   2019',  id = 'controls-and-drop_pi_pie', placeholder = 'Select semester from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_pi_pie'),
-
-    #ftf asian
-    html.Div(children = 'FTF 1-Year Student Retention by Ethnic Sub-groups: Asian Groups'),
-    dcc.Dropdown(options= ftf_asian_frame['Asian Group'].unique(), value = 'Filipino',  id = 'controls-and-drop_rtn_asian', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_asian'),
-
-    html.Div(children = 'FTF 2-Year Student Retention by Ethnic Sub-groups: Asian Groups'),
-    dcc.Dropdown(options= ftf_asian_frame['Asian Group'].unique(), value = 'Filipino',  id = 'controls-and-drop_rtn_asian_2', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_asian_2'),
-
-    html.Div(children = 'FTF 4-Year Student Retention by Ethnic Sub-groups: Asian Groups'),
-    dcc.Dropdown(options= ftf_asian_frame['Asian Group'].unique(), value = 'Filipino',  id = 'controls-and-drop_rtn_asian_4', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_asian_4'),
-
-    html.Div(children = 'FTF 6-Year Student Retention by Ethnic Sub-groups: Asian Groups'),
-    dcc.Dropdown(options= ftf_asian_frame['Asian Group'].unique(), value = 'Filipino',  id = 'controls-and-drop_rtn_asian_6', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_asian_6'),
-
-    #pacific ialander ftf
-    html.Div(children = 'FTF 1-Year Student Retention by Ethnic Sub-groups: Pacific Islander Groups'),
-    dcc.Dropdown(options= ftf_pacific_islander_frame['Pacific Islander Group'].unique(), value = 'Other Pac.Islander', id = 'controls-and-drop_rtn_pi', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_pi'),
-
-    html.Div(children = 'FTF 2-Year Student Retention by Ethnic Sub-groups: Pacific Islander Groups'),
-    dcc.Dropdown(options= ftf_pacific_islander_frame['Pacific Islander Group'].unique(), value = 'Other Pac.Islander', id = 'controls-and-drop_rtn_pi_2', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_pi_2'),
-
-    html.Div(children = 'FTF 4-Year Student Retention by Ethnic Sub-groups: Pacific Islander Groups'),
-    dcc.Dropdown(options= ftf_pacific_islander_frame['Pacific Islander Group'].unique(), value = 'Other Pac.Islander', id = 'controls-and-drop_rtn_pi_4', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_pi_4'),
-
-    html.Div(children = 'FTF 6-Year Student Retention by Ethnic Sub-groups: Pacific Islander Groups'),
-    dcc.Dropdown(options= ftf_pacific_islander_frame['Pacific Islander Group'].unique(), value = 'Other Pac.Islander', id = 'controls-and-drop_rtn_pi_6', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_pi_6'),
-
-    #transfer asian
-    html.Div(children = 'Transfer 1-Year Student Retention by Ethnic Sub-groups: Asian Groups'),
-    dcc.Dropdown(options= transfer_asian_frame['Asian Group'].unique(), value = 'Filipino',  id = 'controls-and-drop_rtn_asian_trf', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_asian_trf'),
-
-    html.Div(children = 'Transfer 2-Year Student Retention by Ethnic Sub-groups: Asian Groups'),
-    dcc.Dropdown(options= transfer_asian_frame['Asian Group'].unique(), value = 'Filipino',  id = 'controls-and-drop_rtn_asian_trf_2', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_asian_trf_2'),
-
-    html.Div(children = 'Transfer 4-Year Student Retention by Ethnic Sub-groups: Asian Groups'),
-    dcc.Dropdown(options= transfer_asian_frame['Asian Group'].unique(), value = 'Filipino',  id = 'controls-and-drop_rtn_asian_trf_4', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_asian_trf_4'),
-
-    html.Div(children = 'Transfer 6-Year Student Retention by Ethnic Sub-groups: Asian Groups'),
-    dcc.Dropdown(options= transfer_asian_frame['Asian Group'].unique(), value = 'Filipino',  id = 'controls-and-drop_rtn_asian_trf_6', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_asian_trf_6'),
-
-#transfer pacific islander
-    html.Div(children = 'Transfer 1-Year Student Retention by Ethnic Sub-groups: Pacific Islander Groups'),
-    dcc.Dropdown(options= transfer_pacific_islander_frame['Pacific Islander Group'].unique(), value = 'Other Pac.Islander',  id = 'controls-and-drop_rtn_pi_trf', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_pi_trf'),
-
-    html.Div(children = 'Transfer 2-Year Student Retention by Ethnic Sub-groups: Pacific Islander Groups'),
-    dcc.Dropdown(options= transfer_pacific_islander_frame['Pacific Islander Group'].unique(), value = 'Other Pac.Islander',  id = 'controls-and-drop_rtn_pi_trf_2', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_pi_trf_2'),
-
-    html.Div(children = 'Transfer 4-Year Student Retention by Ethnic Sub-groups: Pacific Islander Groups'),
-    dcc.Dropdown(options= transfer_pacific_islander_frame['Pacific Islander Group'].unique(), value = 'Other Pac.Islander',  id = 'controls-and-drop_rtn_pi_trf_4', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_pi_trf_4'),
-
-    html.Div(children = 'Transfer 6-Year Student Retention by Ethnic Sub-groups: Pacific Islander Groups'),
-    dcc.Dropdown(options= transfer_pacific_islander_frame['Pacific Islander Group'].unique(), value = 'Other Pac.Islander',  id = 'controls-and-drop_rtn_pi_trf_6', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_pi_trf_6'),
-
-#ftf retention asian chart
-    html.Div(children = 'FTF Student Retention by Ethnic Sub-groups: Asian Groups'),
-    dcc.Dropdown(options= ftf_asian_frame['Asian Group'].unique(), value = 'Filipino',  id = 'controls-and-drop_rtn_asian_ftf_chart', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_asian_ftf_chart'),
-
-#ftf retention pacific islander chart
-    html.Div(children = 'FTF Student Retention by Ethnic Sub-groups: Pacific Islander Groups'),
-    dcc.Dropdown(options= ftf_pacific_islander_frame['Pacific Islander Group'].unique(), value = 'Other Pac.Islander',  id = 'controls-and-drop_rtn_pi_ftf_chart', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_pi_ftf_chart'),
-
-#transfer retention asian chart
-    html.Div(children = 'Transfer Student Retention by Ethnic Sub-groups: Asian Groups'),
-    dcc.Dropdown(options= transfer_asian_frame['Asian Group'].unique(), value = 'Filipino',  id = 'controls-and-drop_rtn_asian_trf_chart', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_asian_trf_chart'),
-
-#transfer retention pacific islander chart
-    html.Div(children = 'Transfer Student Retention by Ethnic Sub-groups: Pacific Islander Groups'),
-    dcc.Dropdown(options= transfer_pacific_islander_frame['Pacific Islander Group'].unique(), value = 'Other Pac.Islander', id = 'controls-and-drop_rtn_pi_trf_chart', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_pi_trf_chart'),
-
-#asian standing chart
-    html.Div(children = 'Academic Standing by Ethnic Sub-groups: Asian Groups'),
-    dcc.Dropdown(options= asian_standing_frame['Asian Group'].unique(), value = 'Filipino',  id = 'controls-and-drop_stndg_asian_chart', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_stndg_asian_chart'),
-
-#pi standing chart
-    html.Div(children = 'Academic Standing by Ethnic Sub-groups: Pacific Islander Groups'),
-    dcc.Dropdown(options= pi_standing_frame['Pacific Islander Group'].unique(), value = 'Other Pac.Islander',  id = 'controls-and-drop_stndg_pi_chart', placeholder = 'Select group from list below' ),
-    dcc.Graph(figure = {}, id = 'controls-and-graph_stndg_pi_chart'),
-
-    ])
+        html.Div(children = 'Student Enrollment by Ethnic Sub-groups: Pacific Islander Groups'),
+        dcc.Dropdown(options= aapi_data.group_values('pacific_islander_group_counts', 'pacific_islander_group'), value = 'Other Pac.Islander',  id = 'controls-and-drop_pi', placeholder = 'Select group from list below' ),
+        dcc.Loading(dcc.Graph(figure = {}, id = 'controls-and-graph_pi')),
+
+        html.Div(children = 'Student Enrollment by Ethnic Sub-groups: Asian Groups'),
+        dcc.Dropdown(options= aapi_data.group_values('asian_group_counts', 'semester'), value = 'Fall   2019',  id = 'controls-and-drop_pie', placeholder = 'Select semester from list below' ),
+        dcc.Loading(dcc.Graph(figure = {}, id = 'controls-and-graph_pie')),
+
+        html.Div(children = 'Student Enrollment by Ethnic Sub-groups: Pacific Islander Groups'),
+        dcc.Dropdown(options= aapi_data.group_values('pacific_islander_group_counts', 'semester'), value = 'Fall   2019',  id = 'controls-and-drop_pi_pie', placeholder = 'Select semester from list below' ),
+        dcc.Loading(dcc.Graph(figure = {}, id = 'controls-and-graph_pi_pie')),
+
+        *comparison_layout(['asian_trends', 'pi_trends']),
+        ]
+
+def ftf_section():
+    return [
+        *retention_layout(['ftf_asian', 'ftf_pi']),
+
+        #ftf retention asian chart
+        html.Div(children = 'FTF Student Retention by Ethnic Sub-groups: Asian Groups'),
+        dcc.Dropdown(options= aapi_data.group_values('ftf_asian', 'Asian Group'), value = 'Filipino',  id = 'controls-and-drop_rtn_asian_ftf_chart', placeholder = 'Select group from list below' ),
+        dcc.Loading(dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_asian_ftf_chart')),
+
+        #ftf retention pacific islander chart
+        html.Div(children = 'FTF Student Retention by Ethnic Sub-groups: Pacific Islander Groups'),
+        dcc.Dropdown(options= aapi_data.group_values('ftf_pacific_islander', 'Pacific Islander Group'), value = 'Other Pac.Islander',  id = 'controls-and-drop_rtn_pi_ftf_chart', placeholder = 'Select group from list below' ),
+        dcc.Loading(dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_pi_ftf_chart')),
+
+        *comparison_layout(['ftf_asian_horizons', 'ftf_pi_horizons']),
+        *table_stores(['ftf_asian', 'ftf_pacific_islander']),
+        ]
+
+def transfer_section():
+    return [
+        *retention_layout(['trf_asian', 'trf_pi']),
+
+        #transfer retention asian chart
+        html.Div(children = 'Transfer Student Retention by Ethnic Sub-groups: Asian Groups'),
+        dcc.Dropdown(options= aapi_data.group_values('transfer_asian', 'Asian Group'), value = 'Filipino',  id = 'controls-and-drop_rtn_asian_trf_chart', placeholder = 'Select group from list below' ),
+        dcc.Loading(dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_asian_trf_chart')),
+
+        #transfer retention pacific islander chart
+        html.Div(children = 'Transfer Student Retention by Ethnic Sub-groups: Pacific Islander Groups'),
+        dcc.Dropdown(options= aapi_data.group_values('transfer_pacific_islander', 'Pacific Islander Group'), value = 'Other Pac.Islander', id = 'controls-and-drop_rtn_pi_trf_chart', placeholder = 'Select group from list below' ),
+        dcc.Loading(dcc.Graph(figure = {}, id = 'controls-and-graph_rtn_pi_trf_chart')),
+
+        *comparison_layout(['trf_asian_horizons', 'trf_pi_horizons']),
+        *table_stores(['transfer_asian', 'transfer_pacific_islander']),
+        ]
+
+def standing_section():
+    return [
+        #asian standing chart
+        html.Div(children = 'Academic Standing by Ethnic Sub-groups: Asian Groups'),
+        dcc.Dropdown(options= aapi_data.group_values('asian_standing', 'Asian Group'), value = 'Filipino',  id = 'controls-and-drop_stndg_asian_chart', placeholder = 'Select group from list below' ),
+        dcc.Loading(dcc.Graph(figure = {}, id = 'controls-and-graph_stndg_asian_chart')),
+
+        #pi standing chart
+        html.Div(children = 'Academic Standing by Ethnic Sub-groups: Pacific Islander Groups'),
+        dcc.Dropdown(options= aapi_data.group_values('pi_standing', 'Pacific Islander Group'), value = 'Other Pac.Islander',  id = 'controls-and-drop_stndg_pi_chart', placeholder = 'Select group from list below' ),
+        dcc.Loading(dcc.Graph(figure = {}, id = 'controls-and-graph_stndg_pi_chart')),
+
+        *table_stores(['asian_standing', 'pi_standing']),
+        ]
+
+sections = {
+    'enrollment': ('Enrollment', enrollment_section),
+    'ftf': ('FTF Retention', ftf_section),
+    'transfer': ('Transfer Retention', transfer_section),
+    'standing': ('Academic Standing', standing_section),
+    }
+
+def serve_layout():
+    # the first tab is rendered inline, so a page load needs no extra round trip for it
+    return html.Div([
+        dcc.Tabs(id = 'section-tabs', value = 'enrollment', children = [dcc.Tab(label = label, value = section) for section, (label, build) in sections.items()]),
+        html.Div(children = enrollment_section(), id = 'section-content'),
+        ])
+
+app.layout = serve_layout
+
+@callback(
+    Output(component_id = 'section-content', component_property = 'children'),
+    Input(component_id = 'section-tabs', component_property = 'value'),
+    prevent_initial_call = True
+        )
+def render_section(section):
+    return sections[section][1]()
 
 @callback(
     Output(component_id = 'controls-and-graph', component_property = 'figure'),
     Input(component_id = 'controls-and-drop', component_property = 'value')
         )
+@cached_figure('asian_line', metric = 'total', options = ('asian_group_counts', 'asian_group'))
 def update_graph_asian(ethnic_select):
-    fig = px.line(asian_group_counts_ug_frame.loc[asian_group_counts_ug_frame['asian_group'] == ethnic_select], x = 'semester', y = 'total', color = 'asian_group', height = 600, width = 1200) 
+    fig = px.line(aapi_data.lookup('asian_group_counts', 'asian_group', ethnic_select), x = 'semester', y = 'total', color = 'asian_group', height = 600, width = 1200) 
     return fig
 
 
@@ -278,233 +371,79 @@ def update_graph_asian(ethnic_select):
     Output(component_id = 'controls-and-graph_pi', component_property = 'figure'),
     Input(component_id = 'controls-and-drop_pi', component_property = 'value')
         )
+@cached_figure('pi_line', metric = 'total', options = ('pacific_islander_group_counts', 'pacific_islander_group'))
 def update_graph_pacific_islander(ethnic_select):
-    fig = px.line(pacific_islander_group_counts_ug_frame.loc[pacific_islander_group_counts_ug_frame['pacific_islander_group'] == ethnic_select], x = 'semester', y = 'total', color = 'pacific_islander_group', height = 600, width = 1200) 
+    fig = px.line(aapi_data.lookup('pacific_islander_group_counts', 'pacific_islander_group', ethnic_select), x = 'semester', y = 'total', color = 'pacific_islander_group', height = 600, width = 1200) 
     return fig
 
 @callback(
     Output(component_id = 'controls-and-graph_pie', component_property = 'figure'),
     Input(component_id = 'controls-and-drop_pie', component_property = 'value')
         )
+@cached_figure('asian_pie', metric = 'total', options = ('asian_group_counts', 'semester'))
 def update_graph_asian_pie(term_select):
-    fig = px.pie(asian_group_counts_ug_frame.loc[asian_group_counts_ug_frame['semester'] == term_select], values = 'total', names = 'asian_group', height = 600, width = 1200) 
+    fig = px.pie(aapi_data.lookup('asian_group_counts', 'semester', term_select), values = 'total', names = 'asian_group', height = 600, width = 1200) 
     return fig
 
 @callback(
     Output(component_id = 'controls-and-graph_pi_pie', component_property = 'figure'),
     Input(component_id = 'controls-and-drop_pi_pie', component_property = 'value')
         )
+@cached_figure('pi_pie', metric = 'total', options = ('pacific_islander_group_counts', 'semester'))
 def update_graph_pi_pie(term_select):
-    fig = px.pie(pacific_islander_group_counts_ug_frame.loc[pacific_islander_group_counts_ug_frame['semester'] == term_select], values = 'total', names = 'pacific_islander_group', height = 600, width = 1200) 
-    return fig
-
-
-#asian ftf callbacks
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_asian', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_asian', component_property = 'value')
-        )
-def update_graph_asian_rtn_line(ethnic_select):
-    fig = px.line(ftf_asian_frame.loc[ftf_asian_frame['Asian Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 1Yr', color = 'Asian Group', height = 600, width = 1200) 
-    return fig
-
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_asian_2', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_asian_2', component_property = 'value')
-        )
-def update_graph_asian_rtn_line2(ethnic_select):
-    fig = px.line(ftf_asian_frame.loc[ftf_asian_frame['Asian Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 2Yr', color = 'Asian Group', height = 600, width = 1200) 
-    return fig
-
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_asian_4', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_asian_4', component_property = 'value')
-        )
-def update_graph_asian_rtn_line4(ethnic_select):
-    fig = px.line(ftf_asian_frame.loc[ftf_asian_frame['Asian Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 4Yr', color = 'Asian Group', height = 600, width = 1200) 
-    return fig
-
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_asian_6', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_asian_6', component_property = 'value')
-        )
-def update_graph_asian_rtn_line6(ethnic_select):
-    fig = px.line(ftf_asian_frame.loc[ftf_asian_frame['Asian Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 6Yr', color = 'Asian Group', height = 600, width = 1200) 
-    return fig
-
-#pacific islander ftf callbacks
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_pi', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_pi', component_property = 'value')
-        )
-def update_graph_pi_rtn_line(ethnic_select):
-    fig = px.line(ftf_pacific_islander_frame.loc[ftf_pacific_islander_frame['Pacific Islander Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 1Yr', color = 'Pacific Islander Group', height = 600, width = 1200) 
-    return fig
-
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_pi_2', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_pi_2', component_property = 'value')
-        )
-def update_graph_pi_rtn_line2(ethnic_select):
-    fig = px.line(ftf_pacific_islander_frame.loc[ftf_pacific_islander_frame['Pacific Islander Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 2Yr', color = 'Pacific Islander Group', height = 600, width = 1200) 
-    return fig
-
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_pi_4', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_pi_4', component_property = 'value')
-        )
-def update_graph_pi_rtn_line4(ethnic_select):
-    fig = px.line(ftf_pacific_islander_frame.loc[ftf_pacific_islander_frame['Pacific Islander Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 4Yr', color = 'Pacific Islander Group', height = 600, width = 1200) 
-    return fig
-
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_pi_6', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_pi_6', component_property = 'value')
-        )
-def update_graph_pi_rtn_line6(ethnic_select):
-    fig = px.line(ftf_pacific_islander_frame.loc[ftf_pacific_islander_frame['Pacific Islander Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 6Yr', color = 'Pacific Islander Group', height = 600, width = 1200) 
-    return fig
-
-#asian transfer callbacks
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_asian_trf', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_asian_trf', component_property = 'value')
-        )
-def update_graph_asian_rtn_line_trf(ethnic_select):
-    fig = px.line(transfer_asian_frame.loc[transfer_asian_frame['Asian Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 1Yr', color = 'Asian Group', height = 600, width = 1200) 
-    return fig
-
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_asian_trf_2', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_asian_trf_2', component_property = 'value')
-        )
-def update_graph_asian_rtn_line2_trf(ethnic_select):
-    fig = px.line(transfer_asian_frame.loc[transfer_asian_frame['Asian Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 2Yr', color = 'Asian Group', height = 600, width = 1200) 
-    return fig
-
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_asian_trf_4', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_asian_trf_4', component_property = 'value')
-        )
-def update_graph_asian_rtn_line4_trf(ethnic_select):
-    fig = px.line(transfer_asian_frame.loc[transfer_asian_frame['Asian Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 4Yr', color = 'Asian Group', height = 600, width = 1200) 
-    return fig
-
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_asian_trf_6', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_asian_trf_6', component_property = 'value')
-        )
-def update_graph_asian_rtn_line6_trf(ethnic_select):
-    fig = px.line(transfer_asian_frame.loc[transfer_asian_frame['Asian Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 6Yr', color = 'Asian Group', height = 600, width = 1200) 
-    return fig
-
-#pacific islander transfer callbacks
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_pi_trf', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_pi_trf', component_property = 'value')
-        )
-def update_graph_pi_rtn_line_trf(ethnic_select):
-    fig = px.line(transfer_pacific_islander_frame.loc[transfer_pacific_islander_frame['Pacific Islander Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 1Yr', color = 'Pacific Islander Group', height = 600, width = 1200) 
-    return fig
-
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_pi_trf_2', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_pi_trf_2', component_property = 'value')
-        )
-def update_graph_pi_rtn_line2_trf(ethnic_select):
-    fig = px.line(transfer_pacific_islander_frame.loc[transfer_pacific_islander_frame['Pacific Islander Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 2Yr', color = 'Pacific Islander Group', height = 600, width = 1200) 
-    return fig
-
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_pi_trf_4', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_pi_trf_4', component_property = 'value')
-        )
-def update_graph_pi_rtn_line4_trf(ethnic_select):
-    fig = px.line(transfer_pacific_islander_frame.loc[transfer_pacific_islander_frame['Pacific Islander Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 4Yr', color = 'Pacific Islander Group', height = 600, width = 1200) 
+    fig = px.pie(aapi_data.lookup('pacific_islander_group_counts', 'semester', term_select), values = 'total', names = 'pacific_islander_group', height = 600, width = 1200) 
     return fig
 
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_pi_trf_6', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_pi_trf_6', component_property = 'value')
-        )
-def update_graph_pi_rtn_line6_trf(ethnic_select):
-    fig = px.line(transfer_pacific_islander_frame.loc[transfer_pacific_islander_frame['Pacific Islander Group'] == ethnic_select], x = 'Cohort Semester', y = 'Retention 6Yr', color = 'Pacific Islander Group', height = 600, width = 1200) 
-    return fig 
-
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_asian_ftf_chart', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_asian_ftf_chart', component_property = 'value')
-        )
-def update_graph_asian_ftf_chart(ethnic_select):
-    fig = go.Figure(data = [go.Table(header = dict(values = list(ftf_asian_frame.columns),
-    fill_color = 'lavender',
-    align = 'left'),
-    cells = dict(values = ftf_asian_frame.loc[ftf_asian_frame['Asian Group'] == ethnic_select].transpose().values.tolist()))
-    ])
-    return fig
-
-@callback(
-    Output(component_id = 'controls-and-graph_rtn_pi_ftf_chart', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_pi_ftf_chart', component_property = 'value')
-        )
-def update_graph_pi_ftf_chart(ethnic_select):
-    fig = go.Figure(data = [go.Table(header = dict(values = list(ftf_pacific_islander_frame.columns),
-    fill_color = 'lavender',
-    align = 'left'),
-    cells = dict(values = ftf_pacific_islander_frame.loc[ftf_pacific_islander_frame['Pacific Islander Group'] == ethnic_select].transpose().values.tolist()))
-    ])
-    return fig
 
+#retention callbacks
+# one pattern-matching callback fills every retention graph of a section in a single request when it opens, then only re-renders the graph whose dropdown changed
 @callback(
-    Output(component_id = 'controls-and-graph_rtn_asian_trf_chart', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_asian_trf_chart', component_property = 'value')
+    Output(component_id = {'type': 'rtn-graph', 'index': ALL}, component_property = 'figure'),
+    Input(component_id = {'type': 'rtn-drop', 'index': ALL}, component_property = 'value'),
+    State(component_id = {'type': 'rtn-drop', 'index': ALL}, component_property = 'id')
         )
-def update_graph_asian_trf_chart(ethnic_select):
-    fig = go.Figure(data = [go.Table(header = dict(values = list(transfer_asian_frame.columns),
-    fill_color = 'lavender',
-    align = 'left'),
-    cells = dict(values = transfer_asian_frame.loc[transfer_asian_frame['Asian Group'] == ethnic_select].transpose().values.tolist()))
-    ])
-    return fig
-
+def update_graph_retention(ethnic_selects, drop_ids):
+    figs = []
+    for ethnic_select, drop_id in zip(ethnic_selects, drop_ids):
+        if ctx.triggered_id is not None and ctx.triggered_id != drop_id:
+            figs.append(no_update)
+        else:
+            figs.append(retention_figure(drop_id['index'], ethnic_select))
+    return figs
+
+#comparison callbacks
 @callback(
-    Output(component_id = 'controls-and-graph_rtn_pi_trf_chart', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_rtn_pi_trf_chart', component_property = 'value')
+    Output(component_id = {'type': 'cmp-graph', 'index': ALL}, component_property = 'figure'),
+    Input(component_id = {'type': 'cmp-groups', 'index': ALL}, component_property = 'value'),
+    Input(component_id = {'type': 'cmp-metric', 'index': ALL}, component_property = 'value'),
+    State(component_id = {'type': 'cmp-groups', 'index': ALL}, component_property = 'id')
         )
-def update_graph_pi_trf_chart(ethnic_select):
-    fig = go.Figure(data = [go.Table(header = dict(values = list(transfer_pacific_islander_frame.columns),
-    fill_color = 'lavender',
-    align = 'left'),
-    cells = dict(values = transfer_pacific_islander_frame.loc[transfer_pacific_islander_frame['Pacific Islander Group'] == ethnic_select].transpose().values.tolist()))
-    ])
-    return fig
-
-@callback(
-    Output(component_id = 'controls-and-graph_stndg_asian_chart', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_stndg_asian_chart', component_property = 'value')
+def update_graph_comparison(group_selects, metric_selects, group_ids):
+    figs = []
+    for groups, metric, group_id in zip(group_selects, metric_selects, group_ids):
+        if ctx.triggered_id is not None and ctx.triggered_id['index'] != group_id['index']:
+            figs.append(no_update)
+        else:
+            figs.append(comparison_figure(group_id['index'], groups, metric))
+    return figs
+
+#table callbacks
+for graph, table in table_charts.items():
+    clientside_callback(
+        ClientsideFunction(namespace = 'aapi', function_name = 'table'),
+        Output(component_id = graph, component_property = 'figure'),
+        Input(component_id = table['drop'], component_property = 'value'),
+        Input(component_id = 'table-data-' + table['dataset'], component_property = 'data'),
+        State(component_id = 'table-shell', component_property = 'data')
         )
-def update_graph_asian_standing_chart(ethnic_select):
-    fig = go.Figure(data = [go.Table(header = dict(values = list(asian_standing_frame.columns),
-    fill_color = 'lavender',
-    align = 'left'),
-    cells = dict(values = asian_standing_frame.loc[asian_standing_frame['Asian Group'] == ethnic_select].transpose().values.tolist()))
-    ])
-    return fig
 
-@callback(
-    Output(component_id = 'controls-and-graph_stndg_pi_chart', component_property = 'figure'),
-    Input(component_id = 'controls-and-drop_stndg_pi_chart', component_property = 'value')
-        )
-def update_graph_pi_standing_chart(ethnic_select):
-    fig = go.Figure(data = [go.Table(header = dict(values = list(pi_standing_frame.columns),
-    fill_color = 'lavender',
-    align = 'left'),
-    cells = dict(values = pi_standing_frame.loc[pi_standing_frame['Pacific Islander Group'] == ethnic_select].transpose().values.tolist()))
-    ])
-    return fig
+if os.environ.get('AAPI_PRERENDER') == '1':
+    prerender_figures()
 
 
 if __name__ == '__main__':
+    aapi_data.log_to_stderr()
+    aapi_data.start_refresher()
     app.run(host = '0.0.0.0', port = '5000', debug = True)
 
 
@@ -0,0 +1,517 @@
+import os
+import time
+import hashlib
+import logging
+import functools
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+import aapi_metrics
+from sqlalchemy import bindparam, create_engine, inspect, text
+from sqlalchemy.pool import QueuePool
+
+
+log = logging.getLogger(__name__)
+
+# called by the entry points: this module's messages (load, ingest and refresh timings) at INFO, other libraries' at WARNING
+def log_to_stderr():
+    logging.basicConfig(format = '%(asctime)s [%(process)d] %(name)s %(levelname)s: %(message)s')
+    log.setLevel(logging.INFO)
+
+db_path = os.environ.get('AAPI_DB_PATH', 'aapi_dash.db')
+database_url = os.environ.get('AAPI_DATABASE_URL')
+pool_size = int(os.environ.get('AAPI_DB_POOL_SIZE', 5))
+
+if database_url:
+    # a server-backed database (e.g. postgresql://user@host/db), which needs its driver installed.
+    # pre_ping replaces connections the server has dropped since the last query
+    engine = create_engine(database_url, echo = False, poolclass = QueuePool, pool_size = pool_size, pool_pre_ping = True,
+        connect_args = {'check_same_thread': False} if database_url.startswith('sqlite') else {})
+else:
+    # the dashboard only reads, so the file is opened read-only. connections are pooled and shared between threads;
+    # run migrate_db.py on the file to put it in WAL mode so these readers never wait on a writer
+    engine = create_engine('sqlite:///file:%s?mode=ro&uri=true' % db_path, echo = False, poolclass = QueuePool,
+        pool_size = pool_size, connect_args = {'check_same_thread': False})
+
+# for log messages, with any password masked
+database = repr(engine.url)
+
+# memory: every dataset is read in full and filtered through its group indexes.
+# sql: nothing is held in memory; each lookup runs a parameterized query, which needs the indexes from migrate_db.py to stay fast
+data_mode = os.environ.get('AAPI_DATA_MODE', 'memory')
+
+# sqlite: memory mode reads each dataset from the database.
+# arrow: memory mode maps the snapshot files written by build_snapshot.py, falling back to the database for any that are missing
+data_source = os.environ.get('AAPI_DATA_SOURCE', 'sqlite')
+snapshot_dir = os.environ.get('AAPI_SNAPSHOT_DIR', 'snapshot')
+
+
+# if needed, place an 'r' before any parameter in order to address special characters such as '\'. For example, if your user name contains '\', you'll need to place 'r' before the user name: user=r'User Name'
+
+asian_groups_ug = '''
+select trim(asian_group) asian_group,
+year_term,
+trim(semester) semester,
+total
+from asian_group_counts
+'''
+
+pacific_islander_groups_ug = '''
+select trim(pacific_islander_group) pacific_islander_group,
+year_term,
+trim(semester) semester,
+total
+from pacific_islander_group_counts 
+'''
+
+FTF_ASIAN = '''
+select trim(asian_group) asian_group,
+cohort_year_term,
+cohort_semester,
+"#ENTERING_COHORT",
+retention_1yr,
+retention_2yr,
+retention_4yr,
+retention_6yr
+from ftf_asian_rtn
+'''
+
+FTF_PACIFIC_ISLANDER =  '''
+select trim(pacific_islander_group) pacific_islander_group,
+cohort_year_term,
+cohort_semester,
+"#ENTERING_COHORT",
+retention_1yr,
+retention_2yr,
+retention_4yr,
+retention_6yr
+from ftf_pi_rtn
+'''
+
+TRANSFER_ASIAN =  '''
+select trim(asian_group) asian_group,
+cohort_year_term,
+cohort_semester,
+"#ENTERING_COHORT",
+retention_1yr,
+retention_2yr,
+retention_4yr,
+retention_6yr from trf_asian_rtn
+'''
+
+TRANSFER_PACIFIC_ISLANDER = '''
+select trim(pacific_islander_group) pacific_islander_group,
+cohort_year_term,
+cohort_semester,
+"#ENTERING_COHORT",
+retention_1yr,
+retention_2yr,
+retention_4yr,
+retention_6yr from tfr_pi_rtn
+'''
+
+asian_standing = '''
+select trim(asian_group) asian_group,
+standing, 
+year_term,
+semester,
+total_enroll,
+standing_count,
+standing_pct
+from asian_standing where total_enroll >= 5
+order by 3, 6 desc, 5 desc, 1 
+'''
+
+pi_standing = '''
+select trim(pacific_islander_group) pacific_islander_group,
+standing, 
+year_term,
+semester,
+total_enroll,
+standing_count,
+standing_pct
+from pi_standing where total_enroll >= 5
+order by 3, 6 desc, 5 desc, 1 
+'''
+
+#datasets
+# each dataset is read lazily on first use. 'index' lists the columns callbacks filter on, which get a group index.
+# 'term' is the query column new terms are published under, which incremental ingestion (see ingest) tracks.
+# 'category' columns are stored as pandas categoricals: numpy code arrays plus one shared set of labels, which keeps
+# the frames (and every group slice) free of per-row python strings whose refcounts would dirty copy-on-write pages.
+# integer columns are downcast to the smallest type that holds them; float columns stay float64 so retention and
+# standing percentages serialize exactly as stored (61.4, not 61.400001525878906). missing retention stays NaN
+retention_columns = ['Cohort Semester', '#Entering Cohort', 'Retention 1Yr', 'Retention 2Yr', 'Retention 4Yr', 'Retention 6Yr']
+standing_columns = ['Academic Standing', 'Term Code', 'Semester', 'Total Enrollment', 'Standing Total', 'Standing %']
+
+datasets = {
+    #enrollment counts
+    'asian_group_counts': dict(query = asian_groups_ug, term = 'year_term', category = ['asian_group', 'year_term', 'semester'], index = ['asian_group', 'semester']),
+    'pacific_islander_group_counts': dict(query = pacific_islander_groups_ug, term = 'year_term', category = ['pacific_islander_group', 'year_term', 'semester'], index = ['pacific_islander_group', 'semester']),
+
+    #retention
+    'ftf_asian': dict(query = FTF_ASIAN, term = 'cohort_year_term', drop = 'cohort_year_term', columns = ['Asian Group'] + retention_columns, category = ['Asian Group', 'Cohort Semester'], index = ['Asian Group']),
+    'ftf_pacific_islander': dict(query = FTF_PACIFIC_ISLANDER, term = 'cohort_year_term', drop = 'cohort_year_term', columns = ['Pacific Islander Group'] + retention_columns, category = ['Pacific Islander Group', 'Cohort Semester'], index = ['Pacific Islander Group']),
+    'transfer_asian': dict(query = TRANSFER_ASIAN, term = 'cohort_year_term', drop = 'cohort_year_term', columns = ['Asian Group'] + retention_columns, category = ['Asian Group', 'Cohort Semester'], index = ['Asian Group']),
+    'transfer_pacific_islander': dict(query = TRANSFER_PACIFIC_ISLANDER, term = 'cohort_year_term', drop = 'cohort_year_term', columns = ['Pacific Islander Group'] + retention_columns, category = ['Pacific Islander Group', 'Cohort Semester'], index = ['Pacific Islander Group']),
+
+    #standing
+    'asian_standing': dict(query = asian_standing, term = 'year_term', columns = ['Asian Group'] + standing_columns, category = ['Asian Group', 'Academic Standing', 'Term Code', 'Semester'], index = ['Asian Group']),
+    'pi_standing': dict(query = pi_standing, term = 'year_term', columns = ['Pacific Islander Group'] + standing_columns, category = ['Pacific Islander Group', 'Academic Standing', 'Term Code', 'Semester'], index = ['Pacific Islander Group']),
+    }
+
+
+def read_sql_frame(name, column = None, select = None, after = None, through = None):
+    # column/select filters on one group or semester; after/through bound the rows by term
+    spec = datasets[name]
+    conditions, params = [], {}
+    if column is not None:
+        conditions.append('"%s" = :select' % query_column(name, column))
+        params['select'] = select
+    if after is not None:
+        conditions.append('"%s" > :after' % spec['term'])
+        params['after'] = after
+    if through is not None:
+        conditions.append('"%s" <= :through' % spec['term'])
+        params['through'] = through
+    if not conditions:
+        frame = pd.read_sql_query(spec['query'], engine)
+    else:
+        # sqlite flattens the wrapped query, so the filter lands on the underlying trim(column) and can use its index
+        frame = pd.read_sql_query(text('select * from (%s) as q where %s' % (spec['query'], ' and '.join(conditions))), engine, params = params)
+    return shape(name, frame)
+
+def shape(name, frame):
+    # the column drop, renames, categoricals and integer downcasts every frame read from the database gets
+    spec = datasets[name]
+    if 'drop' in spec:
+        frame = frame.drop(columns = spec['drop'])
+    if 'columns' in spec:
+        frame.columns = spec['columns']
+    for column in spec.get('category', []):
+        frame[column] = frame[column].astype('category')
+    for column in frame.select_dtypes('integer').columns:
+        frame[column] = pd.to_numeric(frame[column], downcast = 'integer')
+    return frame
+
+#snapshots
+# a snapshot is one uncompressed arrow ipc file per dataset, holding the frame exactly as read_sql_frame leaves it.
+# memory-mapping it lets every worker read from the same page cache, and columns without nulls convert to pandas without a copy
+def snapshot_path(name):
+    return os.path.join(snapshot_dir, name + '.arrow')
+
+def read_snapshot(name):
+    import pyarrow as pa
+    table = pa.ipc.open_file(pa.memory_map(snapshot_path(name))).read_all()
+    return table.to_pandas(split_blocks = True)
+
+def read_frame(name):
+    if data_source == 'arrow':
+        if os.path.exists(snapshot_path(name)):
+            high_water.pop(name, None)
+            return read_snapshot(name)
+        log.warning('no snapshot at %s, reading %s from %s', snapshot_path(name), name, database)
+    # the frame is read up to a high-water mark taken first, so a term published mid-read is left whole for the next ingest
+    mark = latest_term(name)
+    frame = read_sql_frame(name, through = mark)
+    high_water[name] = mark
+    return frame
+
+def latest_term(name):
+    with engine.connect() as conn:
+        return conn.execute(text('select max("%s") from (%s) as q' % (datasets[name]['term'], datasets[name]['query']))).scalar()
+
+# the dataset query's column names, less the dropped one, in frame order
+@functools.lru_cache(maxsize = None)
+def query_columns(name):
+    spec = datasets[name]
+    with engine.connect() as conn:
+        names = list(conn.execute(text('select * from (%s) as q limit 0' % spec['query'])).keys())
+    if 'drop' in spec:
+        names.remove(spec['drop'])
+    return names
+
+def frame_columns(name):
+    spec = datasets[name]
+    return spec['columns'] if 'columns' in spec else query_columns(name)
+
+# the name a frame column has in the dataset query, before the frame's columns are renamed
+def query_column(name, column):
+    if 'columns' not in datasets[name]:
+        return column
+    return query_columns(name)[frame_columns(name).index(column)]
+
+def iter_rows(name, filters, chunk_rows):
+    # yields the rows matching filters ({frame column: [values]}) in frames of at most chunk_rows.
+    # sql mode streams them off a database cursor; memory mode slices the loaded frame
+    if data_mode == 'sql':
+        conditions, params = [], {}
+        for i, (column, values) in enumerate(filters.items()):
+            conditions.append('"%s" in :filter%d' % (query_column(name, column), i))
+            params['filter%d' % i] = list(values)
+        where = ' where ' + ' and '.join(conditions) if conditions else ''
+        query = text('select * from (%s) as q%s' % (datasets[name]['query'], where)).bindparams(*[bindparam(key, expanding = True) for key in params])
+        with engine.connect().execution_options(stream_results = True) as conn:
+            for chunk in pd.read_sql_query(query, conn, params = params, chunksize = chunk_rows):
+                yield shape(name, chunk)
+        return
+    rows = frame(name)
+    for column, values in filters.items():
+        # filter values arrive as strings; a numeric column compares them as numbers, the way the database does
+        if pd.api.types.is_numeric_dtype(rows[column]):
+            values = pd.to_numeric(pd.Series(values), errors = 'coerce')
+        rows = rows[rows[column].isin(values)]
+    for start in range(0, len(rows), chunk_rows):
+        yield rows.iloc[start:start + chunk_rows]
+
+#group indexes
+# each frame is indexed once per group/semester so callbacks do a dict lookup and an iloc instead of a boolean mask over the
+# whole frame. the index holds each group's row positions rather than copies of its rows, so it costs a few integers per row
+def group_index(frame, column):
+    return frame.groupby(column, sort = False, observed = True).indices
+
+def build(name):
+    start = time.perf_counter()
+    with aapi_metrics.timed('read', name):
+        frame = read_frame(name)
+    read = time.perf_counter() - start
+    with aapi_metrics.timed('index', name):
+        indexes = {column: group_index(frame, column) for column in datasets[name]['index']}
+    log.info('loaded %s: %d rows, read %.3fs, index %.3fs', name, len(frame), read, time.perf_counter() - start - read)
+    return frame, indexes
+
+
+#loaded data
+# loaded maps a dataset name to a (frame, indexes) pair. a reload builds new pairs off to the side and swaps
+# them in one assignment each, so a callback that already fetched a pair keeps a consistent view.
+# each dataset has its own lock, so different datasets load in parallel while two callbacks never read the same one twice
+loaded = {}
+load_locks = {name: threading.Lock() for name in datasets}
+generation = 0
+reload_listeners = []
+
+# data_version names the data the frames were read from (see data_token), the same in every worker that holds the same
+# data, where generation only counts swaps in this process. it is taken before reading, so it never claims newer data than was read.
+# loaded_token is the data_token it was derived from, which the refresher compares against
+data_version = None
+loaded_token = None
+
+# high_water maps each dataset read from the database to the latest term in its frame. ingest_listeners are called
+# with the {dataset: {column: group keys}} an ingest touched, or {dataset: None} for a dataset it had to re-read in full
+high_water = {}
+ingest_listeners = []
+
+# datasets are read concurrently at startup and on reload, one pooled connection per thread, so the queries' round trips
+# to a database server overlap. a local sqlite file has no round trips to overlap and pandas parses under the gil, so it loads serially
+load_threads = int(os.environ.get('AAPI_LOAD_THREADS', pool_size if database_url else 1))
+
+def get(name):
+    snapshot = loaded.get(name)
+    if snapshot is None:
+        with load_locks[name]:
+            snapshot = loaded.get(name)
+            if snapshot is None:
+                snapshot = loaded[name] = build(name)
+    return snapshot
+
+def frame(name):
+    if data_mode == 'sql':
+        return read_sql_frame(name)
+    return get(name)[0]
+
+def lookup(name, column, select):
+    with aapi_metrics.timed('filter', name):
+        if data_mode == 'sql':
+            return read_sql_frame(name, column, select)
+        frame, indexes = get(name)
+        return frame.iloc[indexes[column].get(select, [])]
+
+def group_values(name, column):
+    if data_mode == 'sql':
+        with engine.connect() as conn:
+            return [row[0] for row in conn.execute(text('select distinct "%s" from (%s) as q' % (query_column(name, column), datasets[name]['query'])))]
+    return list(get(name)[1][column])
+
+def in_parallel(function, names):
+    with ThreadPoolExecutor(max(1, load_threads), thread_name_prefix = 'aapi-load') as pool:
+        return list(pool.map(function, names))
+
+def load_all():
+    if data_mode == 'sql':
+        return
+    start = time.perf_counter()
+    current_version()
+    in_parallel(get, list(datasets))
+    for name in summaries:
+        summary(name)
+    log.info('loaded %d datasets from %s in %.3fs', len(datasets), database, time.perf_counter() - start)
+
+def token_version(token):
+    return hashlib.sha1(repr(token).encode()).hexdigest()[:16]
+
+def current_version():
+    global data_version, loaded_token
+    if data_version is None:
+        loaded_token = data_token()
+        data_version = token_version(loaded_token)
+    return data_version
+
+def reload():
+    global generation, data_version, loaded_token
+    token = data_token()
+    names = list(loaded)
+    fresh = dict(zip(names, in_parallel(build, names)))
+    loaded.update(fresh)
+    data_version, loaded_token = token_version(token), token
+    generation += 1
+    for listener in reload_listeners:
+        listener()
+
+
+#summaries
+# aggregates derived from the loaded frames for the comparison charts, with a group index like the datasets'.
+# trends: each group's enrollment per semester with its share of that semester and the change from the same term a year earlier.
+# retention: every horizon of every cohort as one row, without the horizons a cohort hasn't reached yet.
+# a summary is built once per data generation, so a reload or ingest rebuilds it on next use
+def semester_trends(frame, group):
+    trends = frame[[group, 'year_term', 'semester', 'total']].rename(columns = {'total': 'Enrollment'})
+    trends['Share %'] = (100.0 * trends['Enrollment'] / trends.groupby('year_term', observed = True)['Enrollment'].transform('sum')).round(2)
+    # term codes are year * 10 + term, so the same term a year earlier is the code minus 10
+    term = trends['year_term'].astype(int)
+    earlier = pd.DataFrame({group: trends[group], 'term': term + 10, 'prior': trends['Enrollment']})
+    prior = pd.DataFrame({group: trends[group], 'term': term}).merge(earlier, on = [group, 'term'], how = 'left')['prior'].to_numpy()
+    trends['YoY Change'] = trends['Enrollment'] - prior
+    trends['YoY Change %'] = (100.0 * trends['YoY Change'] / prior).round(2)
+    return trends.iloc[term.argsort(kind = 'stable')].reset_index(drop = True)
+
+def retention_horizons(frame, group):
+    horizons = frame.melt(id_vars = [group, 'Cohort Semester', '#Entering Cohort'], var_name = 'Horizon', value_name = 'Retention',
+        value_vars = [column for column in frame.columns if column.startswith('Retention ')])
+    horizons['Horizon'] = horizons['Horizon'].str.replace('Retention ', '').astype('category')
+    return horizons.dropna(subset = ['Retention']).reset_index(drop = True)
+
+summaries = {
+    'asian_trends': dict(source = 'asian_group_counts', build = semester_trends, group = 'asian_group'),
+    'pacific_islander_trends': dict(source = 'pacific_islander_group_counts', build = semester_trends, group = 'pacific_islander_group'),
+    'ftf_asian_horizons': dict(source = 'ftf_asian', build = retention_horizons, group = 'Asian Group'),
+    'ftf_pacific_islander_horizons': dict(source = 'ftf_pacific_islander', build = retention_horizons, group = 'Pacific Islander Group'),
+    'transfer_asian_horizons': dict(source = 'transfer_asian', build = retention_horizons, group = 'Asian Group'),
+    'transfer_pacific_islander_horizons': dict(source = 'transfer_pacific_islander', build = retention_horizons, group = 'Pacific Islander Group'),
+    }
+built_summaries = {}
+
+def summary(name):
+    # (generation, frame, group index). the generation is read first, so a summary built across a swap is rebuilt on next use
+    current = generation
+    built = built_summaries.get(name)
+    if built is None or built[0] != current:
+        spec = summaries[name]
+        source = frame(spec['source'])
+        with aapi_metrics.timed('summarize', name):
+            rows = spec['build'](source, spec['group'])
+            built = built_summaries[name] = (current, rows, group_index(rows, spec['group']))
+    return built
+
+def summary_lookup(name, groups):
+    current, rows, index = summary(name)
+    positions = [index[group] for group in groups if group in index]
+    return rows.iloc[np.concatenate(positions)] if positions else rows.iloc[0:0]
+
+
+#incremental ingestion
+# appends the rows of terms published since each frame's high-water mark, instead of re-reading whole tables.
+# the group indexes are rebuilt over the combined frame, and the groups that gained rows are reported to the listeners. this assumes a publish only adds terms: rows
+# changed in place in an older term (a cohort's later retention years filling in) are only picked up by reload()
+def append_rows(frame, rows):
+    # categoricals only concatenate as categoricals when both sides share one set of labels
+    frame, rows = frame.copy(), rows.copy()
+    for column in frame.select_dtypes('category').columns:
+        labels = frame[column].cat.categories
+        labels = labels.append(rows[column].cat.categories.difference(labels))
+        frame[column] = frame[column].cat.set_categories(labels)
+        rows[column] = rows[column].cat.set_categories(labels)
+    return pd.concat([frame, rows], ignore_index = True)
+
+def ingest_dataset(name):
+    mark = latest_term(name)
+    if mark == high_water[name]:
+        return {}
+    if high_water[name] is not None and (mark is None or mark < high_water[name]):
+        # terms were removed, which appending can't express
+        loaded[name] = build(name)
+        log.info('latest term in %s went back to %s, re-read it in full', name, mark)
+        return None
+    rows = read_sql_frame(name, after = high_water[name], through = mark)
+    frame, indexes = loaded[name]
+    combined = append_rows(frame, rows)
+    touched = {column: rows[column].unique().tolist() for column in indexes}
+    loaded[name] = (combined, {column: group_index(combined, column) for column in indexes})
+    high_water[name] = mark
+    log.info('ingested %d rows into %s through term %s', len(rows), name, mark)
+    return touched
+
+def ingest():
+    global generation, data_version, loaded_token
+    token = data_token()
+    changes = {}
+    for name in list(loaded):
+        if name not in high_water:
+            continue
+        with load_locks[name]:
+            touched = ingest_dataset(name)
+        if touched != {}:
+            # reported as soon as it is swapped in: if a later dataset fails, the retry finds this one at its high-water
+            # mark and would never report it, leaving its old figures cached
+            changes[name] = touched
+            generation += 1
+            for listener in ingest_listeners:
+                listener({name: touched})
+    data_version, loaded_token = token_version(token), token
+    return changes
+
+
+#background refresh
+# the refresher polls the sqlite file's mtime (and its -wal file's) and, if present, max(version) from a data_version table.
+# when reading snapshots it polls the snapshot files instead. when anything changes, every dataset that has been loaded is re-read and swapped in,
+# or with AAPI_REFRESH_MODE=append, frames read from the database only take in new terms
+refresh_seconds = float(os.environ.get('AAPI_REFRESH_SECONDS', 60))
+refresh_mode = os.environ.get('AAPI_REFRESH_MODE', 'reload')
+refresher = None
+
+def data_token():
+    if data_source == 'arrow' and data_mode == 'memory':
+        return tuple(os.path.getmtime(snapshot_path(name)) for name in datasets if os.path.exists(snapshot_path(name)))
+    # in WAL mode a publish lands in the -wal file and only reaches the main file at checkpoint.
+    # a server-backed database has no file to watch, only data_version
+    token = [] if database_url else [os.path.getmtime(path) for path in (db_path, db_path + '-wal') if os.path.exists(path)]
+    with engine.connect() as conn:
+        if inspect(conn).has_table('data_version'):
+            token.append(conn.execute(text('select max(version) from data_version')).scalar())
+    return tuple(token)
+
+def refresh_loop(interval):
+    # starts from the token of the data this process holds, not of the data on disk now: a worker forked from a master that
+    # loaded before the last publish must still see that publish as a change
+    current_version()
+    token = loaded_token
+    while True:
+        time.sleep(interval)
+        try:
+            current = data_token()
+            if current != token:
+                if refresh_mode == 'append' and data_mode == 'memory' and data_source == 'sqlite':
+                    ingest()
+                else:
+                    reload()
+                    log.info('reloaded %d datasets from %s', len(loaded), database)
+                token = loaded_token
+        except Exception:
+            log.exception('data refresh failed, keeping current frames')
+
+def start_refresher(interval = refresh_seconds):
+    global refresher
+    if interval <= 0 or (refresher is not None and refresher.is_alive()):
+        return
+    refresher = threading.Thread(target = refresh_loop, args = (interval,), name = 'aapi-data-refresh', daemon = True)
+    refresher.start()
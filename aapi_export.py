@@ -0,0 +1,64 @@
+# csv and excel downloads of any dataset, optionally filtered on its columns, streamed so no export is built in memory at once
+#   /export/<dataset>.csv or /export/<dataset>.xlsx, e.g. /export/ftf_asian.csv?Asian+Group=Filipino&Asian+Group=Hmong
+# repeating a column keeps the rows matching any of its values. rows come off a database cursor in sql mode and out of the
+# loaded frame in memory mode, AAPI_EXPORT_CHUNK_ROWS at a time. an xlsx file is a zip that can't be sent before it's complete,
+# so it is written row by row to a temporary file in xlsxwriter's constant-memory mode and streamed from there.
+# each worker runs at most AAPI_EXPORT_SLOTS exports at once (default 1) so downloads never hold every thread the
+# dashboard's callbacks need; an export over the limit gets a 503 and a Retry-After
+import os
+import tempfile
+import threading
+import pandas as pd
+import aapi_data
+from flask import Response, abort, request
+
+
+chunk_rows = int(os.environ.get('AAPI_EXPORT_CHUNK_ROWS', 5000))
+export_slots = threading.BoundedSemaphore(int(os.environ.get('AAPI_EXPORT_SLOTS', 1)))
+
+def csv_chunks(name, filters):
+    yield pd.DataFrame(columns = aapi_data.frame_columns(name)).to_csv(index = False)
+    for rows in aapi_data.iter_rows(name, filters, chunk_rows):
+        yield rows.to_csv(index = False, header = False)
+
+def xlsx_chunks(name, filters):
+    import xlsxwriter
+    with tempfile.TemporaryFile() as spool:
+        workbook = xlsxwriter.Workbook(spool, {'constant_memory': True})
+        sheet = workbook.add_worksheet(name[:31])
+        sheet.write_row(0, 0, aapi_data.frame_columns(name))
+        row = 1
+        for rows in aapi_data.iter_rows(name, filters, chunk_rows):
+            # missing values become empty cells
+            for values in rows.astype(object).where(rows.notna(), None).itertuples(index = False):
+                sheet.write_row(row, 0, values)
+                row += 1
+        workbook.close()
+        spool.seek(0)
+        for block in iter(lambda: spool.read(64 * 1024), b''):
+            yield block
+
+formats = {
+    'csv': (csv_chunks, 'text/csv'),
+    'xlsx': (xlsx_chunks, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    }
+
+
+def register(server):
+    @server.route('/export/<name>.<any(csv, xlsx):extension>')
+    def export(name, extension):
+        if name not in aapi_data.datasets:
+            abort(404)
+        columns = aapi_data.frame_columns(name)
+        filters = {column: request.args.getlist(column) for column in request.args}
+        unknown = [column for column in filters if column not in columns]
+        if unknown:
+            abort(400, 'unknown column(s) %s, %s has %s' % (', '.join(unknown), name, ', '.join(columns)))
+        if not export_slots.acquire(blocking = False):
+            return Response('too many exports running, try again shortly\n', status = 503, mimetype = 'text/plain', headers = {'Retry-After': '10'})
+        write, mimetype = formats[extension]
+        response = Response(write(name, filters), mimetype = mimetype,
+            headers = {'Content-Disposition': 'attachment; filename="%s.%s"' % (name, extension)})
+        # runs once the response is sent or the client goes away, even if streaming never started
+        response.call_on_close(export_slots.release)
+        return response
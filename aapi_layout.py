@@ -0,0 +1,71 @@
+# the dashboard as a browser sees it: walks a served layout and builds the callback requests a browser would send, for the
+# tools that drive the dashboard without one (bench_dash.py, build_static.py, load_test.py)
+import json
+
+
+def stringify_id(component_id):
+    return json.dumps(component_id, sort_keys = True, separators = (',', ':')) if isinstance(component_id, dict) else component_id
+
+def walk(node, components):
+    if isinstance(node, list):
+        for child in node:
+            walk(child, components)
+    elif isinstance(node, dict) and 'props' in node:
+        if 'id' in node['props']:
+            components[stringify_id(node['props']['id'])] = node
+        walk(node['props'].get('children'), components)
+
+def matches(pattern, component_id):
+    return isinstance(component_id, dict) and set(pattern) == set(component_id) and all(
+        value == component_id[key] or isinstance(value, list) for key, value in pattern.items())
+
+def resolve(components, id_string):
+    # a plain id, or every component matching a pattern id such as {"index":["ALL"],"type":"rtn-drop"}
+    if not id_string.startswith('{'):
+        return id_string
+    pattern = json.loads(id_string)
+    return [component['props']['id'] for component in components.values() if matches(pattern, component['props']['id'])]
+
+def prop_values(components, dependency, overrides):
+    resolved = resolve(components, dependency['id'])
+    def value(component_id):
+        key = (stringify_id(component_id), dependency['property'])
+        return overrides[key] if key in overrides else components[stringify_id(component_id)]['props'].get(dependency['property'])
+    if isinstance(resolved, list):
+        return [{'id': component_id, 'property': dependency['property'], 'value': value(component_id)} for component_id in resolved]
+    return {'id': resolved, 'property': dependency['property'], 'value': value(resolved)}
+
+def fires_on_load(components, callback):
+    # the browser fires a callback on page load when all its inputs are in the layout, unless it opted out
+    if callback.get('prevent_initial_call'):
+        return False
+    return all(resolve(components, dependency['id']) if dependency['id'].startswith('{') else dependency['id'] in components
+        for dependency in callback['inputs'])
+
+def open_sections(client, components, callbacks):
+    # components of the dashboard's other tabs only exist once their section is fetched, so fetch every one of them
+    for callback in callbacks:
+        if not callback['output'].endswith('.children'):
+            continue
+        for dependency in callback['inputs']:
+            for value in choices(components[dependency['id']]['props']):
+                body = request_body(components, callback, {(dependency['id'], dependency['property']): value})
+                response = json.loads(client.post('/_dash-update-component', json = body).data)['response']
+                for props in response.values():
+                    walk(props.get('children'), components)
+
+def request_body(components, callback, overrides = None):
+    overrides = overrides or {}
+    id_string, prop = callback['output'].rsplit('.', 1)
+    outputs = resolve(components, id_string)
+    return {
+        'output': callback['output'],
+        'outputs': [{'id': output, 'property': prop} for output in outputs] if isinstance(outputs, list) else {'id': outputs, 'property': prop},
+        'inputs': [prop_values(components, dependency, overrides) for dependency in callback['inputs']],
+        'state': [prop_values(components, dependency, overrides) for dependency in callback['state']],
+        'changedPropIds': ['%s.%s' % key for key in overrides],
+        }
+
+def choices(props):
+    # a dropdown's options, or the values of a dcc.Tabs' tabs
+    return props.get('options') or [tab['props']['value'] for tab in props.get('children') or [] if isinstance(tab, dict)]
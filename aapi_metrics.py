@@ -0,0 +1,137 @@
+# hot-path timing for the dashboard, exposed in prometheus text format on /metrics.
+#   aapi_stage_seconds{stage, name}: time per stage. stages are read/index (data loading, per dataset), filter (per dataset),
+#     summarize (per summary), figure and serialize (per chart) and request (per callback output). timers nest and each records only its own time,
+#     so a filter inside a figure render is not counted twice, and request is what a callback request spends outside the other stages
+#   aapi_figure_cache_total{name, result}: figure cache hits and misses per chart
+# every gunicorn worker keeps its own numbers and reports its pid as a label.
+# AAPI_PROFILE_HZ > 0 also runs a sampling profiler whose collapsed stacks (flamegraph.pl/speedscope format) are on /metrics/profile
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from flask import Response, g, request
+
+
+buckets = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+lock = threading.Lock()
+histograms = {}
+counters = Counter()
+gauges = {}
+local = threading.local()
+
+def observe(stage, name, seconds):
+    with lock:
+        histogram = histograms.get((stage, name))
+        if histogram is None:
+            histogram = histograms[(stage, name)] = [[0] * len(buckets), 0.0, 0]
+        for i, bound in enumerate(buckets):
+            if seconds <= bound:
+                histogram[0][i] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+@contextmanager
+def timed(stage, name):
+    stack = local.__dict__.setdefault('stack', [])
+    stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        observe(stage, name, elapsed - nested)
+
+def increment(metric, **labels):
+    with lock:
+        counters[(metric, tuple(sorted(labels.items())))] += 1
+
+def gauge(metric, read):
+    gauges[metric] = read
+
+
+#exposition
+def label_text(labels):
+    return ','.join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in labels)
+
+def render():
+    pid = ('pid', os.getpid())
+    lines = ['# HELP aapi_stage_seconds Time spent per stage, excluding nested stages.', '# TYPE aapi_stage_seconds histogram']
+    with lock:
+        for (stage, name), (counts, total, count) in sorted(histograms.items()):
+            labels = [pid, ('stage', stage), ('name', name)]
+            for bound, bucket_count in zip(buckets, counts):
+                lines.append('aapi_stage_seconds_bucket{%s} %d' % (label_text(labels + [('le', bound)]), bucket_count))
+            lines.append('aapi_stage_seconds_bucket{%s} %d' % (label_text(labels + [('le', '+Inf')]), count))
+            lines.append('aapi_stage_seconds_sum{%s} %.6f' % (label_text(labels), total))
+            lines.append('aapi_stage_seconds_count{%s} %d' % (label_text(labels), count))
+        typed = set()
+        for (metric, labels), value in sorted(counters.items()):
+            if metric not in typed:
+                lines.append('# TYPE %s counter' % metric)
+                typed.add(metric)
+            lines.append('%s{%s} %d' % (metric, label_text((pid,) + labels), value))
+    for metric, read in sorted(gauges.items()):
+        lines += ['# TYPE %s gauge' % metric, '%s{%s} %s' % (metric, label_text([pid]), read())]
+    return '\n'.join(lines) + '\n'
+
+
+#sampling profiler
+profile_hz = float(os.environ.get('AAPI_PROFILE_HZ', 0))
+profile_stacks = Counter()
+profiler = None
+
+def sample_loop(interval):
+    me = threading.get_ident()
+    while True:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append('%s:%s' % (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name))
+                frame = frame.f_back
+            with lock:
+                profile_stacks[';'.join(reversed(stack))] += 1
+        time.sleep(interval)
+
+def start_profiler():
+    # started from the first request rather than at import, so it also runs in forked gunicorn workers
+    global profiler
+    if profile_hz <= 0 or (profiler is not None and profiler.is_alive()):
+        return
+    profiler = threading.Thread(target = sample_loop, args = (1.0 / profile_hz,), name = 'aapi-profiler', daemon = True)
+    profiler.start()
+
+
+#flask
+def register(server):
+    @server.before_request
+    def start_request_timer():
+        start_profiler()
+        if request.path.endswith('/_dash-update-component'):
+            # entered here and left at teardown, so the stages the callback runs nest inside it
+            body = request.get_json(silent = True) or {}
+            g.aapi_request_timer = timed('request', body.get('output', 'unknown'))
+            g.aapi_request_timer.__enter__()
+
+    @server.teardown_request
+    def record_request_time(error):
+        timer = g.pop('aapi_request_timer', None)
+        if timer is not None:
+            timer.__exit__(None, None, None)
+
+    @server.route('/metrics')
+    def metrics():
+        return Response(render(), mimetype = 'text/plain; version=0.0.4')
+
+    @server.route('/metrics/profile')
+    def profile():
+        with lock:
+            stacks = '\n'.join('%s %d' % (stack, count) for stack, count in profile_stacks.most_common())
+        return Response(stacks + '\n', mimetype = 'text/plain')
@@ -0,0 +1,44 @@
+// puts the lean figure template back into figures. the server strips it from every figure it renders and sends it once,
+// inlined in the index page (see figure_template in aapi_dash2.py); dcc.Graph draws through the global Plotly.react,
+// so the wrapper is installed whenever plotly.js assigns window.Plotly
+(function () {
+    var element = document.getElementById('aapi-figure-template');
+    if (!element) {
+        return;
+    }
+    var template = JSON.parse(element.textContent);
+
+    function withTemplate(layout) {
+        if (layout && layout.template) {
+            return layout;
+        }
+        return Object.assign({}, layout, {template: template});
+    }
+
+    function wrap(plotly) {
+        if (!plotly || plotly.aapiTemplate) {
+            return plotly;
+        }
+        var react = plotly.react;
+        plotly.react = function (gd, data, layout, config) {
+            // called either as react(gd, {data, layout, frames, config}) or as react(gd, data, layout, config)
+            if (data && !Array.isArray(data)) {
+                return react.call(this, gd, Object.assign({}, data, {layout: withTemplate(data.layout)}));
+            }
+            return react.call(this, gd, data, withTemplate(layout), config);
+        };
+        plotly.aapiTemplate = template;
+        return plotly;
+    }
+
+    var plotly = wrap(window.Plotly);
+    Object.defineProperty(window, 'Plotly', {
+        configurable: true,
+        get: function () {
+            return plotly;
+        },
+        set: function (value) {
+            plotly = wrap(value);
+        }
+    });
+})();
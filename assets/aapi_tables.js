@@ -0,0 +1,29 @@
+// clientside callbacks for the dashboard, registered from aapi_dash2.py under the 'aapi' namespace
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    aapi: {
+        // builds one group's go.Table from a dataset store (see table_data in aapi_dash2.py) and the shared table shell
+        table: function (select, data, shell) {
+            if (!data || !shell) {
+                return window.dash_clientside.no_update;
+            }
+            var groups = data.values[data.group];
+            var code = data.labels[data.group].indexOf(select);
+            var rows = [];
+            for (var i = 0; code >= 0 && i < groups.length; i++) {
+                if (groups[i] === code) {
+                    rows.push(i);
+                }
+            }
+            var cells = data.values.map(function (column, j) {
+                var labels = data.labels[j];
+                return rows.map(function (row) {
+                    return labels ? labels[column[row]] : column[row];
+                });
+            });
+            var figure = JSON.parse(JSON.stringify(shell));
+            figure.data[0].header.values = data.columns;
+            figure.data[0].cells = {values: cells};
+            return figure;
+        }
+    }
+});
@@ -0,0 +1,200 @@
+# benchmarks the dashboard through flask's test client: every server callback, the page-load fan-out, startup time and RSS.
+# runs against the configured database (AAPI_DB_PATH) and synthetic copies of it with every group duplicated under new names
+#   python bench_dash.py [--scales 1 10 100] [--values 5] [--repeat 3] [--threads 1] [--output bench.json]
+# other AAPI_* settings (AAPI_DATA_MODE, AAPI_DATA_SOURCE, ...) pass through, so runs with different settings or at
+# different commits can be compared from their --output files
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from aapi_layout import walk, resolve, stringify_id, fires_on_load, open_sections, request_body, choices
+
+
+#synthetic data
+def scale_db(source, target, scale):
+    import migrate_db
+    shutil.copyfile(source, target)
+    conn = sqlite3.connect(target)
+    with conn:
+        for table, columns in migrate_db.filtered.items():
+            group = columns[0]
+            names = [row[1] for row in conn.execute('pragma table_info(%s)' % table)]
+            rows = conn.execute('select max(rowid) from %s' % table).fetchone()[0]
+            for copy in range(1, scale):
+                values = ', '.join("trim(%s) || ' %d'" % (name, copy) if name == group else '"%s"' % name for name in names)
+                conn.execute('insert into %s select %s from %s where rowid <= %d' % (table, values, table, rows))
+    conn.close()
+
+
+#dash requests
+def value_switches(components, callback, values_per_input, rng):
+    # one request per (dropdown, value), each changing a single dropdown the way a user would
+    bodies = []
+    for dependency in callback['inputs']:
+        resolved = resolve(components, dependency['id'])
+        for component_id in (resolved if isinstance(resolved, list) else [resolved]):
+            props = components[stringify_id(component_id)]['props']
+            options = choices(props)
+            for value in rng.sample(options, min(values_per_input, len(options))):
+                # a multi-select dropdown gets a random selection, anywhere from one option to all of them
+                if props.get('multi'):
+                    value = rng.sample(options, rng.randint(1, len(options)))
+                bodies.append(request_body(components, callback, {(stringify_id(component_id), dependency['property']): value}))
+    return bodies
+
+
+#measurement
+def rss_mb():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+def drive(server, bodies, threads):
+    # posts every body, spread over `threads` test clients, and returns per-request (seconds, bytes, status)
+    def post_all(chunk):
+        client = server.test_client()
+        results = []
+        for body in chunk:
+            start = time.perf_counter()
+            response = client.post('/_dash-update-component', json = body)
+            results.append((time.perf_counter() - start, len(response.data), response.status_code))
+        return results
+    chunks = [bodies[i::threads] for i in range(threads)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = [result for chunk in pool.map(post_all, chunks) for result in chunk]
+    return results, time.perf_counter() - start
+
+def summarize(results, wall):
+    latencies = [seconds * 1000 for seconds, size, status in results]
+    return {
+        'requests': len(results),
+        'errors': sum(1 for seconds, size, status in results if status not in (200, 204)),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'throughput_rps': round(len(results) / wall, 1),
+        'mean_bytes': int(sum(size for seconds, size, status in results) / len(results)),
+        }
+
+def run(args):
+    # runs in a fresh interpreter per scale, so startup time and RSS are real
+    start = time.perf_counter()
+    import aapi_data
+    import aapi_dash2
+    aapi_data.load_all()
+    startup = time.perf_counter() - start
+    rss_loaded = rss_mb()
+
+    server = aapi_dash2.app.server
+    client = server.test_client()
+    components = {}
+    walk(json.loads(client.get('/_dash-layout').data), components)
+    callbacks = [callback for callback in json.loads(client.get('/_dash-dependencies').data) if not callback.get('clientside_function')]
+    rng = random.Random(args.seed)
+
+    # page load: the callbacks the first paint fires, once each with the layout's default values
+    page = [request_body(components, callback) for callback in callbacks if fires_on_load(components, callback)]
+    open_sections(client, components, callbacks)
+    page_load = {}
+    for cache in ('cold', 'warm'):
+        passes = []
+        for repeat in range(args.repeat):
+            if cache == 'cold':
+                aapi_dash2.invalidate_figure_cache()
+            results, wall = drive(server, page, 1)
+            passes.append({'seconds': wall, 'bytes': sum(size for seconds, size, status in results)})
+        page_load[cache] = {
+            'requests': len(page),
+            'p50_seconds': round(percentile([p['seconds'] for p in passes], 50), 4),
+            'bytes': passes[-1]['bytes'],
+            }
+
+    # dropdown switches per callback: each sampled value once against an empty figure cache, then --repeat times against a warm one
+    records = []
+    for callback in callbacks:
+        bodies = value_switches(components, callback, args.values, rng)
+        aapi_dash2.invalidate_figure_cache()
+        for cache, repeat in (('cold', 1), ('warm', args.repeat)):
+            results, wall = drive(server, bodies * repeat, args.threads)
+            records.append(dict(callback = callback['output'], cache = cache, **summarize(results, wall)))
+
+    return {
+        'startup_seconds': round(startup, 3),
+        'rss_mb_loaded': round(rss_loaded, 1),
+        'rss_mb_final': round(rss_mb(), 1),
+        'page_load': page_load,
+        'callbacks': records,
+        }
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr = subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(args):
+    source = os.environ.get('AAPI_DB_PATH', 'aapi_dash.db')
+    report = {'commit': git_commit(), 'python': sys.version.split()[0],
+        'settings': {key: value for key, value in os.environ.items() if key.startswith('AAPI_')}, 'scales': []}
+    workdir = tempfile.mkdtemp(prefix = 'aapi_bench_')
+    try:
+        for scale in args.scales:
+            db = source
+            if scale > 1:
+                db = os.path.join(workdir, 'aapi_dash_x%d.db' % scale)
+                scale_db(source, db, scale)
+            env = dict(os.environ, AAPI_DB_PATH = db)
+            command = [sys.executable, os.path.abspath(__file__), '--run', '--values', str(args.values), '--repeat', str(args.repeat),
+                '--threads', str(args.threads), '--seed', str(args.seed)]
+            result = json.loads(subprocess.check_output(command, env = env).decode().splitlines()[-1])
+            result['scale'] = scale
+            report['scales'].append(result)
+            print_scale(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors = True)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent = 1)
+
+def print_scale(result):
+    print('scale x%d: startup %.2fs, rss %.1f MB loaded / %.1f MB after run' % (
+        result['scale'], result['startup_seconds'], result['rss_mb_loaded'], result['rss_mb_final']))
+    for cache, page in result['page_load'].items():
+        print('  page load (%s): %d requests, %.1f ms, %d bytes' % (cache, page['requests'], page['p50_seconds'] * 1000, page['bytes']))
+    print('  %-46s %-5s %6s %9s %9s %9s %10s' % ('callback', 'cache', 'reqs', 'p50 ms', 'p99 ms', 'req/s', 'bytes'))
+    for record in result['callbacks']:
+        print('  %-46s %-5s %6d %9.2f %9.2f %9.1f %10d' % (record['callback'][:46], record['cache'], record['requests'],
+            record['p50_ms'], record['p99_ms'], record['throughput_rps'], record['mean_bytes']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', type = int, nargs = '+', default = [1, 10, 100], help = 'row multipliers to benchmark')
+    parser.add_argument('--values', type = int, default = 5, help = 'dropdown values sampled per input')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'passes over the sampled values')
+    parser.add_argument('--threads', type = int, default = 1, help = 'concurrent test clients')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--output', help = 'write machine-readable results to this json file')
+    parser.add_argument('--run', action = 'store_true', help = argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        print(json.dumps(run(args)))
+    else:
+        main(args)
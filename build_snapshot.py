@@ -0,0 +1,30 @@
+# exports every dataset to an arrow snapshot for AAPI_DATA_SOURCE=arrow
+#   python build_snapshot.py
+# trims, column drops/renames, categoricals and integer downcasts are applied here once, so loading a snapshot is just a memory map.
+# each file is written next to its target and renamed over it, so running workers keep the mapping they have until their refresher
+# picks up the new file
+import os
+import pyarrow as pa
+import aapi_data
+
+
+def write_snapshot(name):
+    frame = aapi_data.read_sql_frame(name)
+    table = pa.Table.from_pandas(frame, preserve_index = False)
+    # from_pandas turns NaN into nulls, which would force a copy on load. keep NaN as a plain float value instead
+    for i, column in enumerate(frame.columns):
+        if frame[column].dtype.kind == 'f':
+            table = table.set_column(i, table.field(i), pa.array(frame[column].to_numpy(), from_pandas = False))
+    path = aapi_data.snapshot_path(name)
+    with pa.OSFile(path + '.tmp', 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(path + '.tmp', path)
+    return path, table.num_rows
+
+
+if __name__ == '__main__':
+    os.makedirs(aapi_data.snapshot_dir, exist_ok = True)
+    for name in aapi_data.datasets:
+        path, rows = write_snapshot(name)
+        print('%-30s %6d rows  %s' % (name, rows, path))
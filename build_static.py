@@ -0,0 +1,154 @@
+# builds a static copy of the dashboard that a plain file server can host: every figure for every dropdown value as a json
+# file, the table stores, and a viewer (viewer/index.html) that switches between them in the browser
+#   python build_static.py [--output site] [--processes N]
+#   python -m http.server -d site
+# the charts are found by walking each tab's layout and rendered through the app's own callbacks, on a process pool forked
+# after the data is loaded. a comparison chart keeps its default groups and gets one figure per metric.
+# the bundle is built next to the output directory and swapped in when complete, so a file server never sees half of it
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import multiprocessing
+from datetime import datetime, timezone
+import plotly.utils
+from dash import dcc
+import aapi_layout
+import aapi_data
+import aapi_dash2
+
+
+viewer_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'viewer', 'index.html')
+client = None
+
+def flatten(node):
+    # every component of a layout tree, in document order
+    if isinstance(node, list):
+        for child in node:
+            yield from flatten(child)
+    elif isinstance(node, dict) and 'props' in node:
+        yield node
+        yield from flatten(node['props'].get('children'))
+
+def slug(component_id):
+    # {'type': 'rtn-graph', 'index': 'ftf_asian_1'} becomes rtn-graph-ftf-asian-1
+    text = '-'.join(str(component_id[key]) for key in sorted(component_id, reverse = True)) if isinstance(component_id, dict) else component_id
+    return re.sub('[^a-z0-9]+', '-', text.lower()).strip('-')
+
+def option_values(dropdown):
+    return [option['value'] if isinstance(option, dict) else option for option in dropdown['props'].get('options') or []]
+
+def figure_callback(callbacks, graph_id):
+    for callback in callbacks:
+        id_string, prop = callback['output'].rsplit('.', 1)
+        if prop != 'figure':
+            continue
+        if id_string == graph_id or (id_string.startswith('{') and aapi_layout.matches(json.loads(id_string), graph_id)):
+            return callback
+
+def section_charts(tree):
+    # a chart is a title, the dropdowns after it and the graph they drive. the last single-select dropdown is the one the
+    # viewer switches; multi-select ones (a comparison's groups) stay at their defaults
+    charts, title, dropdowns = [], None, []
+    for component in flatten(tree):
+        if component['type'] == 'Div' and isinstance(component['props'].get('children'), str):
+            title, dropdowns = component['props']['children'], []
+        elif component['type'] == 'Dropdown':
+            dropdowns.append(component)
+        elif component['type'] == 'Graph':
+            charts.append((title, dropdowns, component))
+            dropdowns = []
+    return charts
+
+def plan(output, components, callbacks):
+    # the manifest the viewer reads, and one (path, request body, response key) render task per figure file
+    # figures come without the lean template, which the viewer puts back as the dashboard's aapi_figures.js does
+    manifest = {'built': datetime.now(timezone.utc).isoformat(timespec = 'seconds'), 'data_version': aapi_data.current_version(),
+        'template': aapi_dash2.figure_template, 'sections': []}
+    tasks = []
+    for section, (label, build) in aapi_dash2.sections.items():
+        tree = json.loads(json.dumps(build(), cls = plotly.utils.PlotlyJSONEncoder))
+        entry = {'id': section, 'label': label, 'charts': [], 'stores': []}
+        for component in flatten(tree):
+            if component['type'] == 'Store':
+                entry['stores'].append(component['props']['id'])
+                write_json(os.path.join(output, 'stores', component['props']['id'] + '.json'), component['props']['data'])
+        for title, dropdowns, graph in section_charts(tree):
+            graph_id = graph['props']['id']
+            selector = [dropdown for dropdown in dropdowns if not dropdown['props'].get('multi')][-1]
+            chart = {'title': title, 'value': selector['props'].get('value'), 'options': option_values(selector),
+                'fixed': [dropdown['props'].get('value') for dropdown in dropdowns if dropdown['props'].get('multi')]}
+            if isinstance(graph_id, str) and graph_id in aapi_dash2.table_charts:
+                chart['table'] = 'table-data-' + aapi_dash2.table_charts[graph_id]['dataset']
+            else:
+                callback = figure_callback(callbacks, graph_id)
+                chart['files'] = []
+                for i, value in enumerate(chart['options']):
+                    path = 'figures/%s/%d.json' % (slug(graph_id), i)
+                    body = aapi_layout.request_body(components, callback, {(aapi_layout.stringify_id(selector['props']['id']), 'value'): value})
+                    tasks.append((os.path.join(output, path), body, aapi_layout.stringify_id(graph_id)))
+                    chart['files'].append(path)
+            entry['charts'].append(chart)
+        manifest['sections'].append(entry)
+    return manifest, tasks
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    with open(path, 'w') as output:
+        json.dump(data, output, separators = (',', ':'), cls = plotly.utils.PlotlyJSONEncoder)
+    return os.path.getsize(path)
+
+def start_worker():
+    global client
+    client = aapi_dash2.app.server.test_client()
+
+def render(task):
+    path, body, key = task
+    response = client.post('/_dash-update-component', json = body)
+    if response.status_code != 200:
+        raise RuntimeError('%s: %s' % (key, response.data[:300]))
+    return write_json(path, json.loads(response.data)['response'][key]['figure'])
+
+def build(output, processes):
+    start = time.perf_counter()
+    staging = output.rstrip('/\\') + '.new'
+    shutil.rmtree(staging, ignore_errors = True)
+    aapi_data.load_all()
+    start_worker()
+    components = {}
+    aapi_layout.walk(json.loads(client.get('/_dash-layout').data), components)
+    callbacks = json.loads(client.get('/_dash-dependencies').data)
+    aapi_layout.open_sections(client, components, callbacks)
+    manifest, tasks = plan(staging, components, callbacks)
+
+    # workers are forked with the frames already loaded, and must not inherit pooled connections
+    aapi_data.engine.dispose()
+    with multiprocessing.get_context('fork').Pool(processes, initializer = start_worker) as pool:
+        sizes = pool.map(render, tasks, chunksize = 8)
+
+    write_json(os.path.join(staging, 'manifest.json'), manifest)
+    shutil.copy(viewer_path, os.path.join(staging, 'index.html'))
+    shutil.copy(os.path.join(os.path.dirname(dcc.__file__), 'plotly.min.js'), os.path.join(staging, 'plotly.min.js'))
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'aapi_tables.js'), os.path.join(staging, 'aapi_tables.js'))
+
+    retired = output.rstrip('/\\') + '.old'
+    shutil.rmtree(retired, ignore_errors = True)
+    if os.path.exists(output):
+        os.rename(output, retired)
+    os.rename(staging, output)
+    shutil.rmtree(retired, ignore_errors = True)
+    print('built %s: %d figures (%.1f MB) for data version %s in %.1fs on %d processes' % (
+        output, len(tasks), sum(sizes) / 1e6, manifest['data_version'], time.perf_counter() - start, processes))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default = 'site', help = 'directory to write the bundle to')
+    parser.add_argument('--processes', type = int, default = os.cpu_count(), help = 'render processes')
+    args = parser.parse_args()
+    if sys.platform == 'win32':
+        sys.exit('build_static.py forks its render processes, which windows does not support')
+    build(args.output, args.processes)
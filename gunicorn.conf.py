@@ -0,0 +1,17 @@
+import os
+
+
+wsgi_app = 'wsgi:server'
+preload_app = True
+
+bind = os.environ.get('AAPI_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('AAPI_WORKERS', 4))
+threads = int(os.environ.get('AAPI_THREADS', 2))
+
+
+# threads don't survive the fork, so each worker starts its own data refresher.
+# a worker that reloads gets private copies of the new frames; the rest keep sharing the preloaded ones until they reload too.
+# restart the server after a publish to share one copy again (see the README's Production section)
+def post_fork(server, worker):
+    import aapi_data
+    aapi_data.start_refresher()
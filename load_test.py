@@ -0,0 +1,313 @@
+# load test: concurrent dashboard sessions against the app under gunicorn, to size deployments and check server-side changes
+#   python load_test.py [--workers 4] [--threads 2] [--users 1 2 4 8 16 32 64] [--duration 20] [--output load.json]
+#   python load_test.py --url 127.0.0.1:5000 [--pid <gunicorn master pid>]
+# starts gunicorn -c gunicorn.conf.py with the given AAPI_WORKERS/AAPI_THREADS (other AAPI_* settings pass through) unless --url
+# points at a running server. a session is what a viewer's browser does: load the page and fire the first tab's callbacks
+# over up to 6 connections, then switch dropdowns and tabs, one request at a time, with values drawn from the dropdowns'
+# options (so from the groups and semesters in the database). each user level runs --duration seconds of back-to-back
+# sessions and reports throughput, latency percentiles and the RSS and PSS of every worker
+import os
+import sys
+import json
+import gzip
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from aapi_layout import walk, resolve, stringify_id, fires_on_load, request_body, choices
+
+
+#http
+# a minimal keep-alive HTTP/1.1 client, so the load generator needs nothing beyond the standard library
+async def fetch(pool, address, method, path, body = None):
+    data = json.dumps(body).encode() if body is not None else b''
+    head = '%s %s HTTP/1.1\r\nHost: %s:%d\r\nAccept-Encoding: gzip\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n' % (
+        method, path, address[0], address[1], len(data))
+    for attempt in range(2):
+        reused = bool(pool)
+        reader, writer = pool.pop() if reused else await asyncio.open_connection(*address)
+        writer.write(head.encode() + data)
+        try:
+            await writer.drain()
+            status_line = await reader.readline()
+        except ConnectionError:
+            status_line = b''
+        if status_line:
+            break
+        # the server closed an idle keep-alive connection; retry once on a new one
+        writer.close()
+        if not reused:
+            raise ConnectionError('%s %s: connection closed' % (method, path))
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        key, value = line.decode('latin-1').split(':', 1)
+        headers[key.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        payload = b''
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                break
+            payload += chunk[:-2]
+    else:
+        payload = await reader.readexactly(int(headers.get('content-length', 0)))
+    if headers.get('connection', '').lower() == 'close':
+        writer.close()
+    else:
+        pool.append((reader, writer))
+    return int(status_line.split()[1]), payload, headers.get('content-encoding')
+
+def decode(payload, encoding):
+    return json.loads(gzip.decompress(payload) if encoding == 'gzip' else payload)
+
+
+#sessions
+async def discover(address):
+    # the layout, the server callbacks and the components of every tab, fetched once before the run
+    pool = []
+    components = {}
+    walk(decode(*(await fetch(pool, address, 'GET', '/_dash-layout'))[1:]), components)
+    callbacks = [callback for callback in decode(*(await fetch(pool, address, 'GET', '/_dash-dependencies'))[1:]) if not callback.get('clientside_function')]
+    tab_callbacks = [callback for callback in callbacks if callback['output'].endswith('.children')]
+    sections = {}
+    for callback in tab_callbacks:
+        for dependency in callback['inputs']:
+            for value in choices(components[dependency['id']]['props']):
+                body = request_body(components, callback, {(dependency['id'], dependency['property']): value})
+                status, payload, encoding = await fetch(pool, address, 'POST', '/_dash-update-component', body)
+                section = {}
+                for props in decode(payload, encoding)['response'].values():
+                    walk(props.get('children'), section)
+                fired = [callback for callback in callbacks if callback not in tab_callbacks and fires_on_load(section, callback)]
+                sections[value] = dict(open = body, components = section, callbacks = fired,
+                    load = [request_body(section, callback) for callback in fired])
+    for reader, writer in pool:
+        writer.close()
+    return components, callbacks, sections
+
+def switch(section, rng):
+    # one dropdown changed the way a user would: a single-select gets another option, a multi-select a random selection
+    callback = rng.choice(section['callbacks'])
+    dependency = rng.choice(callback['inputs'])
+    resolved = resolve(section['components'], dependency['id'])
+    component_id = rng.choice(resolved) if isinstance(resolved, list) else resolved
+    props = section['components'][stringify_id(component_id)]['props']
+    options = choices(props)
+    value = rng.sample(options, rng.randint(1, len(options))) if props.get('multi') else rng.choice(options)
+    return request_body(section['components'], callback, {(stringify_id(component_id), dependency['property']): value})
+
+async def user(address, sections, first, args, rng, deadline, records):
+    # back-to-back sessions until the deadline. records holds (kind, start, seconds, bytes, status) per request
+    # and ('page', start, seconds, bytes, status) per completed page load
+    pools = [[] for connection in range(6)]
+    async def timed(kind, pool, method, path, body = None):
+        start = time.perf_counter()
+        try:
+            status, payload, encoding = await fetch(pool, address, method, path, body)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            status, payload = 0, b''
+        records.append((kind, start, time.perf_counter() - start, len(payload), status))
+        return status
+    async def fan_out(load):
+        # the browser fires a tab's callbacks at once over at most 6 connections per host
+        statuses = []
+        for offset in range(0, len(load), len(pools)):
+            statuses += await asyncio.gather(*[timed('load', pool, 'POST', '/_dash-update-component', body)
+                for pool, body in zip(pools, load[offset:offset + len(pools)])])
+        return statuses
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        statuses = [await timed('document', pools[0], 'GET', path) for path in ('/', '/_dash-layout', '/_dash-dependencies')]
+        statuses += await fan_out(sections[first]['load'])
+        records.append(('page', start, time.perf_counter() - start, 0, 200 if all(status == 200 for status in statuses) else 0))
+        current = first
+        for action in range(args.switches):
+            if time.perf_counter() >= deadline:
+                break
+            await asyncio.sleep(args.think * rng.random() * 2)
+            if rng.random() < args.tab_rate:
+                current = rng.choice([section for section in sections if section != current])
+                await timed('tab', pools[0], 'POST', '/_dash-update-component', sections[current]['open'])
+                await fan_out(sections[current]['load'])
+            elif sections[current]['callbacks']:
+                # a tab whose dropdowns only drive clientside tables sends nothing on a switch
+                await timed('switch', pools[0], 'POST', '/_dash-update-component', switch(sections[current], rng))
+    for pool in pools:
+        for reader, writer in pool:
+            writer.close()
+
+
+#memory
+def children(pid):
+    try:
+        with open('/proc/%d/task/%d/children' % (pid, pid)) as tasks:
+            return [int(child) for child in tasks.read().split()]
+    except OSError:
+        return []
+
+def memory_mb(pid):
+    # resident set, and proportional set size, which splits the pages workers share copy-on-write between them
+    usage = {}
+    for path, fields in (('/proc/%d/status' % pid, ('VmRSS:',)), ('/proc/%d/smaps_rollup' % pid, ('Pss:',))):
+        try:
+            with open(path) as status:
+                for line in status:
+                    if line.startswith(fields):
+                        usage[line.split(':')[0].lower().replace('vm', '')] = int(line.split()[1]) / 1024.0
+        except OSError:
+            pass
+    return usage
+
+async def sample_memory(master, samples, deadline):
+    while time.perf_counter() < deadline:
+        for pid in [master] + children(master):
+            for key, value in memory_mb(pid).items():
+                samples.setdefault(pid, {})[key] = max(value, samples.get(pid, {}).get(key, 0))
+        await asyncio.sleep(0.5)
+
+
+#levels
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+def summarize(users, records, wall, samples, master):
+    requests = [record for record in records if record[0] != 'page']
+    latencies = [seconds * 1000 for kind, start, seconds, size, status in requests]
+    pages = [seconds * 1000 for kind, start, seconds, size, status in records if kind == 'page']
+    workers = [samples[pid] for pid in samples if pid != master]
+    level = {
+        'users': users,
+        'requests': len(requests),
+        'errors': sum(1 for record in records if record[4] not in (200, 204)),
+        'throughput_rps': round(len(requests) / wall, 1),
+        'page_loads_per_second': round(len(pages) / wall, 2),
+        'mean_bytes': int(sum(record[3] for record in requests) / max(len(requests), 1)),
+        'worker_rss_mb': [round(worker.get('rss', 0), 1) for worker in workers],
+        'worker_pss_mb': [round(worker.get('pss', 0), 1) for worker in workers],
+        'master_rss_mb': round(samples.get(master, {}).get('rss', 0), 1),
+        }
+    for name, values in (('request', latencies), ('page_load', pages)):
+        for pct in (50, 95, 99):
+            level['%s_p%d_ms' % (name, pct)] = round(percentile(values, pct), 1) if values else None
+    for kind in ('load', 'switch', 'tab'):
+        values = [seconds * 1000 for record_kind, start, seconds, size, status in requests if record_kind == kind]
+        level['%s_p99_ms' % kind] = round(percentile(values, 99), 1) if values else None
+    return level
+
+async def run_level(address, sections, first, args, users, duration, master):
+    records, samples = [], {}
+    start = time.perf_counter()
+    deadline = start + duration
+    rngs = [random.Random('%d-%d-%d' % (args.seed, users, i)) for i in range(users)]
+    sampler = asyncio.ensure_future(sample_memory(master, samples, deadline)) if master else None
+    await asyncio.gather(*[user(address, sections, first, args, rng, deadline, records) for rng in rngs])
+    if sampler:
+        await sampler
+    # requests still in flight at the deadline finish and are counted, over the time they took
+    return summarize(users, [record for record in records if record[1] < deadline], time.perf_counter() - start, samples, master)
+
+async def load_test(address, master, args):
+    components, callbacks, sections = await discover(address)
+    first = components['section-tabs']['props']['value']
+    print('%d tabs, %d server callbacks, %d requests on page load' % (len(sections), len(callbacks), len(sections[first]['load']) + 3))
+    if args.warmup:
+        await run_level(address, sections, first, args, max(args.users), args.warmup, None)
+    levels = []
+    for users in args.users:
+        level = await run_level(address, sections, first, args, users, args.duration, master)
+        levels.append(level)
+        print_level(level)
+    return levels
+
+def print_level(level):
+    print('%5d users: %7.1f req/s %6.2f pages/s  request p50/p95/p99 %s/%s/%s ms  page load p50/p99 %s/%s ms  %d errors' % (
+        level['users'], level['throughput_rps'], level['page_loads_per_second'], level['request_p50_ms'], level['request_p95_ms'],
+        level['request_p99_ms'], level['page_load_p50_ms'], level['page_load_p99_ms'], level['errors']))
+    if level['worker_rss_mb']:
+        print('             worker rss %s MB, pss %s MB, master rss %.1f MB' % (
+            '/'.join('%.0f' % value for value in level['worker_rss_mb']), '/'.join('%.0f' % value for value in level['worker_pss_mb']), level['master_rss_mb']))
+
+def saturation(levels):
+    # the level where adding users stopped adding throughput: past it, extra viewers only wait longer
+    peak = max(levels, key = lambda level: level['throughput_rps'])
+    for previous, level in zip(levels, levels[1:]):
+        if level['throughput_rps'] < previous['throughput_rps'] * 1.1:
+            return previous, peak
+    return levels[-1], peak
+
+
+#gunicorn
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+def start_gunicorn(args, log):
+    port = free_port()
+    env = dict(os.environ, AAPI_WORKERS = str(args.workers), AAPI_THREADS = str(args.threads), AAPI_BIND = '127.0.0.1:%d' % port)
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], env = env, stdout = log, stderr = log,
+        cwd = os.path.dirname(os.path.abspath(__file__)))
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline and process.poll() is None:
+        # ready once every worker has forked and one answers
+        if len(children(process.pid)) >= args.workers:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout = 1).close()
+                return process, ('127.0.0.1', port)
+            except OSError:
+                pass
+        time.sleep(0.2)
+    process.kill()
+    log.seek(0)
+    sys.exit('gunicorn did not start:\n' + log.read().decode(errors = 'replace')[-2000:])
+
+def main(args):
+    process = None
+    with tempfile.TemporaryFile() as log:
+        if args.url:
+            host, port = args.url.rsplit(':', 1)
+            address, master = (host, int(port)), args.pid
+        else:
+            process, address = start_gunicorn(args, log)
+            master = process.pid
+        try:
+            levels = asyncio.run(load_test(address, master, args))
+        finally:
+            if process:
+                process.terminate()
+                process.wait()
+    knee, peak = saturation(levels)
+    print('saturation: %.1f req/s (%.2f pages/s) at %d users, request p99 %s ms; peak %.1f req/s at %d users' % (
+        knee['throughput_rps'], knee['page_loads_per_second'], knee['users'], knee['request_p99_ms'], peak['throughput_rps'], peak['users']))
+    if args.output:
+        report = {'workers': None if args.url else args.workers, 'threads': None if args.url else args.threads,
+            'settings': {key: value for key, value in os.environ.items() if key.startswith('AAPI_')}, 'levels': levels,
+            'saturation_users': knee['users'], 'peak_throughput_rps': peak['throughput_rps']}
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent = 1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type = int, default = 4, help = 'gunicorn workers (AAPI_WORKERS)')
+    parser.add_argument('--threads', type = int, default = 2, help = 'threads per worker (AAPI_THREADS)')
+    parser.add_argument('--users', type = int, nargs = '+', default = [1, 2, 4, 8, 16, 32, 64], help = 'concurrent sessions per level')
+    parser.add_argument('--duration', type = float, default = 20, help = 'seconds per level')
+    parser.add_argument('--warmup', type = float, default = 5, help = 'unreported seconds at the highest level first, so figure caches are warm')
+    parser.add_argument('--switches', type = int, default = 20, help = 'dropdown or tab switches per session after the page load')
+    parser.add_argument('--tab-rate', type = float, default = 0.1, help = 'share of switches that open another tab')
+    parser.add_argument('--think', type = float, default = 0, help = 'mean seconds between switches; 0 measures saturation')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--url', help = 'host:port of a running server instead of starting gunicorn')
+    parser.add_argument('--pid', type = int, help = 'with --url, the gunicorn master pid, to report worker memory')
+    parser.add_argument('--startup-timeout', type = float, default = 120)
+    parser.add_argument('--output', help = 'write machine-readable results to this json file')
+    main(parser.parse_args())
@@ -0,0 +1,62 @@
+# compares the in-memory footprint of every dataset as the dashboard used to load it (object strings,
+# fillna(""), int64, plus the transposed *_columns lists) against what aapi_data holds now: the compact frame with its
+# group indexes, and the summaries built from them
+#   python memory_report.py
+import sys
+import tracemalloc
+import pandas as pd
+import aapi_data
+
+
+def list_bytes(columns):
+    # outer list, one list per column and every cell object. cells shared between lists are counted each time they appear
+    return sys.getsizeof(columns) + sum(sys.getsizeof(column) + sum(sys.getsizeof(cell) for cell in column) for column in columns)
+
+def legacy_bytes(name):
+    spec = aapi_data.datasets[name]
+    frame = pd.read_sql_query(spec['query'], aapi_data.engine)
+    if 'drop' in spec:
+        # only the retention frames drop a column, and they were also the ones blanked with fillna("")
+        frame = frame.drop(columns = spec['drop']).fillna("")
+    if 'columns' in spec:
+        frame.columns = spec['columns']
+    return int(frame.memory_usage(deep = True).sum()), list_bytes(frame.transpose().values.tolist())
+
+def retained_bytes(build):
+    # what build's result keeps allocated, measured while it is still alive
+    tracemalloc.start()
+    try:
+        result = build()
+        return tracemalloc.get_traced_memory()[0], result
+    finally:
+        tracemalloc.stop()
+
+def loaded_bytes(name):
+    # the (frame, group indexes) pair the dashboard keeps per dataset. built once first, so caches the first read fills
+    # (compiled statements, column names) aren't counted
+    aapi_data.build(name)
+    return retained_bytes(lambda: aapi_data.build(name))[0]
+
+def summary_bytes(name):
+    spec = aapi_data.summaries[name]
+    source = aapi_data.get(spec['source'])[0]
+    def build():
+        rows = spec['build'](source, spec['group'])
+        return rows, aapi_data.group_index(rows, spec['group'])
+    return retained_bytes(build)[0]
+
+
+if __name__ == '__main__':
+    print('%-44s %12s %12s %12s %12s' % ('dataset', 'frame before', 'lists before', 'held after', 'saved'))
+    totals = [0, 0, 0]
+    for name in aapi_data.datasets:
+        frame_before, lists_before = legacy_bytes(name)
+        after = loaded_bytes(name)
+        totals = [totals[0] + frame_before, totals[1] + lists_before, totals[2] + after]
+        print('%-44s %12d %12d %12d %11.0f%%' % (name, frame_before, lists_before, after, 100 - 100.0 * after / (frame_before + lists_before)))
+    # the summaries are new, so they only count against the after column
+    for name in aapi_data.summaries:
+        after = summary_bytes(name)
+        totals[2] += after
+        print('%-44s %12s %12s %12d' % ('summary ' + name, '', '', after))
+    print('%-44s %12d %12d %12d %11.0f%%' % ('total', totals[0], totals[1], totals[2], 100 - 100.0 * totals[2] / (totals[0] + totals[1])))
@@ -0,0 +1,44 @@
+# migration for aapi_dash.db (and any newly published copy of it) before serving it with AAPI_DATA_MODE=sql
+#   python migrate_db.py [path]
+# stores the padded group columns trimmed, indexes every column the dashboard filters on and switches the file
+# to WAL so the dashboard's read-only connections never block on (or are blocked by) a publish.
+# the dashboard queries select trim(column), which stays correct on an unmigrated file; the indexes are built on
+# that same expression so sqlite can use them for the filtered queries
+import sys
+import sqlite3
+
+
+schema_version = 1
+
+#columns the dashboard queries select as trim(column) and filter on, keyed by table
+filtered = {
+    'asian_group_counts': ['asian_group', 'semester'],
+    'pacific_islander_group_counts': ['pacific_islander_group', 'semester'],
+    'ftf_asian_rtn': ['asian_group'],
+    'ftf_pi_rtn': ['pacific_islander_group'],
+    'trf_asian_rtn': ['asian_group'],
+    'tfr_pi_rtn': ['pacific_islander_group'],
+    'asian_standing': ['asian_group'],
+    'pi_standing': ['pacific_islander_group'],
+    }
+
+
+def migrate(path):
+    conn = sqlite3.connect(path)
+    if conn.execute('pragma user_version').fetchone()[0] >= schema_version:
+        conn.close()
+        return False
+    with conn:
+        for table, columns in filtered.items():
+            conn.execute('update %s set %s' % (table, ', '.join('%s = trim(%s)' % (column, column) for column in columns)))
+            for column in columns:
+                conn.execute('create index if not exists ix_%s_%s on %s (trim(%s))' % (table, column, table, column))
+        conn.execute('pragma user_version = %d' % schema_version)
+    conn.execute('pragma journal_mode = wal')
+    conn.close()
+    return True
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else 'aapi_dash.db'
+    print('migrated %s' % path if migrate(path) else '%s is already migrated' % path)
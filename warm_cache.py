@@ -0,0 +1,26 @@
+# fills the shared figure cache with every dropdown value's figure for the current data, so no worker has to render one on demand
+#   AAPI_CACHE_PATH=figures.db python warm_cache.py [--clear]
+# run it after each publish (or from a deploy hook), with the same AAPI_* settings as the dashboard.
+# keys only change with the data, so a deploy that changes how figures render (templates, chart code) should pass --clear,
+# which empties the cache first instead of leaving figures rendered by the old code to be served for the same data
+import sys
+import time
+import argparse
+import aapi_cache
+import aapi_data
+import aapi_dash2
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clear', action = 'store_true', help = 'empty the cache before filling it')
+    args = parser.parse_args()
+    if not aapi_cache.enabled:
+        sys.exit('AAPI_CACHE_PATH is not set, nothing to warm')
+    start = time.perf_counter()
+    if args.clear:
+        aapi_cache.clear()
+    aapi_data.load_all()
+    count = aapi_dash2.prerender_figures()
+    aapi_cache.prune()
+    print('cached %d figures for data version %s in %s in %.1fs' % (count, aapi_data.current_version(), aapi_cache.path, time.perf_counter() - start))
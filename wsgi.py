@@ -0,0 +1,18 @@
+# production entry point: gunicorn -c gunicorn.conf.py
+# with preload_app the gunicorn master imports this once, loads every dataset and forks the workers,
+# so the frames, group indexes and any figures prerendered with AAPI_PRERENDER=1 are shared between workers copy-on-write
+import gc
+import aapi_data
+import aapi_dash2
+
+
+aapi_data.log_to_stderr()
+aapi_data.load_all()
+
+# no pooled connections may cross the fork
+aapi_data.engine.dispose()
+
+# move everything loaded so far out of the collector's reach, so gc passes in the workers don't write to the shared pages
+gc.freeze()
+
+server = aapi_dash2.app.server